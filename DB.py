@@ -1,16 +1,160 @@
 import sqlite3
 import os
 import re
+import threading
+from contextlib import contextmanager
+
+# Applied once per connection, when it is opened.
+# The database lives on a network share, so WAL (which needs shared memory
+# between processes) is not an option; keep the rollback journal.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA cache_size = -8000;",
+    "PRAGMA journal_mode = DELETE;",
+)
+
+# Errors after which a connection is assumed to be unusable (share dropped,
+# file handle went stale, ...). The connection is thrown away and the next
+# call opens a fresh one.
+RECONNECT_ERRORS = (
+    "disk i/o error",
+    "unable to open database file",
+    "database disk image is malformed",
+    "cannot operate on a closed database",
+)
+
+class ConnectionManager:
+    """
+    Hands out long-lived, pre-configured connections.
+    sqlite3 connections can't be shared between threads, so each thread
+    gets its own connection per database path. Connections are opened with
+    check_same_thread=False only so that close_all can close them from
+    another thread; each one is still used by its own thread alone.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = {}  # conn -> db_path for every open connection, across threads
+
+    def _connections(self):
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def _open(self, db_path):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._all[conn] = db_path
+        return conn
+
+    def get(self, db_path):
+        connections = self._connections()
+        conn = connections.get(db_path)
+        # Missing from _all: closed by close_all on another thread
+        if conn is None or conn not in self._all:
+            conn = self._open(db_path)
+            connections[db_path] = conn
+        return conn
+
+    def discard(self, db_path):
+        """Forget (and close) the current thread's connection to db_path."""
+        conn = self._connections().pop(db_path, None)
+        if conn is not None:
+            self._close(db_path, conn)
+
+    def _close(self, db_path, conn):
+        with self._lock:
+            self._all.pop(conn, None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
 
-def connect(db_path):
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON;")  # ensure FK checks
-    return conn
+    def close_all(self, db_path=None):
+        """
+        Close every thread's connections (all of them, or only those to
+        db_path), e.g. before the file is deleted. Other threads open a new
+        connection the next time they ask for one.
+        """
+        for path in list(self._connections().keys()):
+            if db_path is None or path == db_path:
+                self.discard(path)
+        with self._lock:
+            others = [(conn, path) for conn, path in self._all.items() if db_path is None or path == db_path]
+        for conn, path in others:
+            self._close(path, conn)
 
-def init_db(db_path, test=False):
-    conn = sqlite3.connect(db_path)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    cursor = conn.cursor()
+_manager = ConnectionManager()
+
+def get_connection(db_path):
+    """Returns this thread's pooled connection to db_path, opening it if needed."""
+    return _manager.get(db_path)
+
+def close_connections(db_path=None):
+    _manager.close_all(db_path)
+
+def _is_connection_error(e):
+    msg = str(e).lower()
+    return any(err in msg for err in RECONNECT_ERRORS)
+
+@contextmanager
+def connection(db_path):
+    """
+    Context manager around the pooled connection.
+    Commits on success and rolls back on error, like `with sqlite3.connect(...)`,
+    but leaves the connection open. A connection that failed in a way that
+    leaves it unusable is discarded so the next call reconnects.
+    """
+    conn = get_connection(db_path)
+    try:
+        with conn:
+            yield conn
+    except (sqlite3.OperationalError, sqlite3.ProgrammingError) as e:
+        if _is_connection_error(e):
+            _manager.discard(db_path)
+        raise
+
+def change_counter(db_path):
+    """
+    The file change counter from the database header, bumped by every
+    committed write from any connection or process. Unlike PRAGMA
+    data_version, it can be compared across connections. Only valid in
+    rollback-journal mode (see CONNECTION_PRAGMAS); WAL doesn't update it.
+    Returns None if the header can't be read.
+    """
+    try:
+        with open(db_path, "rb") as f:
+            f.seek(24)
+            header = f.read(4)
+    except OSError:
+        return None
+    if len(header) != 4:
+        return None
+    return int.from_bytes(header, "big")
+
+# How many SQLite VM instructions run between checks for cancellation
+PROGRESS_HANDLER_OPS = 1000
+
+@contextmanager
+def cancellable(conn, cancel_event):
+    """
+    Aborts the statement running on conn as soon as cancel_event is set,
+    which may happen from any thread. The statement then raises
+    sqlite3.OperationalError("interrupted").
+    A progress handler is used rather than conn.interrupt(), which would also
+    abort whatever the pooled connection runs next if it fires late.
+    """
+    conn.set_progress_handler(cancel_event.is_set, PROGRESS_HANDLER_OPS)
+    try:
+        yield conn
+    finally:
+        conn.set_progress_handler(None, 0)
+
+def _create_baseline_schema(cursor):
+    """Migration 1: the schema as it was before versioned migrations."""
 
     # ---------- Products ----------
 
@@ -193,9 +337,6 @@ def init_db(db_path, test=False):
     END;
     """)
 
-    if test:
-        cursor.execute("DROP TRIGGER IF EXISTS on_update_negative_total;")
-
     cursor.execute("""
     CREATE TRIGGER IF NOT EXISTS on_update_negative_total
     AFTER UPDATE ON NonConsumableLogs
@@ -209,9 +350,6 @@ def init_db(db_path, test=False):
     """)
 
 
-    if test:
-        cursor.execute("DROP TRIGGER IF EXISTS on_delete_negative_total;")
-
     cursor.execute("""
     CREATE TRIGGER IF NOT EXISTS on_delete_negative_total
     BEFORE DELETE ON NonConsumableLogs
@@ -250,9 +388,6 @@ def init_db(db_path, test=False):
     END;
     """)
 
-    if test:
-        cursor.execute("DROP TRIGGER IF EXISTS limit_nonconsumable_opened;")
-
     cursor.execute("""
     CREATE TRIGGER IF NOT EXISTS limit_nonconsumable_opened
     BEFORE INSERT ON NonConsumableLogs
@@ -306,12 +441,6 @@ def init_db(db_path, test=False):
     WHERE l.DateFinished == '';
     """)
     
-    if test:
-        cursor.execute("""
-    DROP VIEW IF EXISTS OutOfStockNonConsumables;
-    """)
-    
-    # Create the new view
     cursor.execute("""
     CREATE VIEW IF NOT EXISTS OutOfStockNonConsumables AS
     SELECT
@@ -326,11 +455,6 @@ def init_db(db_path, test=False):
     HAVING TotalQuantityReceived <= TotalQuantityOpened;
     """)
 
-    if test:
-        cursor.execute("""
-    DROP VIEW IF EXISTS AvailableNonConsumables;
-    """)
- 
     cursor.execute("""
     CREATE VIEW IF NOT EXISTS AvailableNonConsumables AS
     SELECT
@@ -374,9 +498,6 @@ def init_db(db_path, test=False):
 
 
     
-    if test:
-        cursor.execute(""" DROP VIEW IF EXISTS ReOrderList; """)
-
     cursor.execute("""
     CREATE VIEW IF NOT EXISTS ReOrderList AS
     SELECT c.ProductName, c.TotalQuantityAvailable, p.IsConsumable, p.UnitOfMeasure, p.Station, p.LowSupplyCount
@@ -400,9 +521,6 @@ def init_db(db_path, test=False):
       AND COALESCE(n.TotalQuantityAvailable, 0) <= p.LowSupplyCount;
     """)
 
-    if test:
-        cursor.execute(""" DROP VIEW IF EXISTS DangerouslyLow; """)
-
     cursor.execute("""
     CREATE VIEW IF NOT EXISTS DangerouslyLow AS
     SELECT c.ProductName, c.TotalQuantityAvailable, p.IsConsumable, p.UnitOfMeasure, p.Station, p.EmergencyCount
@@ -426,93 +544,1096 @@ def init_db(db_path, test=False):
       AND COALESCE(n.TotalQuantityAvailable, 0) <= p.EmergencyCount;
     """)
 
-    if test:
-        cursor.execute(""" DROP VIEW IF EXISTS OutOfStock; """)
-    
-        cursor.execute("""
-        CREATE VIEW IF NOT EXISTS OutOfStock AS
+
+def _create_test_views(cursor):
+    """Views that only exist in test mode."""
+    cursor.execute(""" DROP VIEW IF EXISTS OutOfStock; """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS OutOfStock AS
+    SELECT
+        p.ProductName,
+        COALESCE(SUM(CASE WHEN l.ActionType = 'Received' THEN l.Quantity ELSE 0 END), 0)
+            - COALESCE(SUM(CASE WHEN l.ActionType = 'Opened' THEN l.Quantity ELSE 0 END), 0) AS TotalQuantityAvailable,
+        p.Station,
+        p.IsConsumable
+    FROM Products p
+    LEFT JOIN NonConsumableLogs l
+        ON p.ProductName = l.ProductName
+    WHERE p.IsConsumable = 'n'
+    GROUP BY p.ProductName
+    HAVING TotalQuantityAvailable <= 0
+
+    UNION ALL
+
+    SELECT
+        p.ProductName,
+        COALESCE(SUM(CASE WHEN l2.DateFinished = '' THEN l2.Quantity ELSE 0 END), 0) AS TotalQuantityAvailable,
+        p.Station,
+        p.IsConsumable
+    FROM Products p
+    LEFT JOIN ConsumableLogs l2
+        ON p.ProductName = l2.ProductName
+    WHERE p.IsConsumable = 'y'
+    GROUP BY p.ProductName
+    HAVING TotalQuantityAvailable <= 0;
+
+    """)
+
+def _create_log_indexes(cursor):
+    """
+    Migration 2: secondary indexes for the per-product lookups done by the
+    guard triggers and the analytics views.
+    """
+    # already_opened_one, on_emergency_opened_consumables, OutOfStockConsumables, ConsumablesAvailableTotaled
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ConsumableLogs_ProductName_DateFinished_DateOpened
+    ON ConsumableLogs (ProductName, DateFinished, DateOpened);
+    """)
+
+    # AvailableConsumables: only the lots that are still in use
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ConsumableLogs_Unfinished
+    ON ConsumableLogs (DateFinished)
+    WHERE DateFinished = '';
+    """)
+
+    # Received/Opened totals; covers Quantity so the sums never touch the table
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_NonConsumableLogs_ProductName_ActionType
+    ON NonConsumableLogs (ProductName, ActionType, Quantity);
+    """)
+
+def _consumable_stock_delta(row, sign):
+    return f"""
+    UPDATE ProductStock SET
+        Received = Received {sign} 1,
+        Opened = Opened {sign} (COALESCE({row}.DateOpened, '') != ''),
+        Unopened = Unopened {sign} ({row}.DateOpened IS '' AND {row}.DateFinished IS ''),
+        Unfinished = Unfinished {sign} ({row}.DateFinished IS ''),
+        Available = Available {sign} ({row}.DateFinished IS '')
+    WHERE ProductName = {row}.ProductName;
+    """
+
+def _non_consumable_stock_delta(row, sign):
+    received = f"(CASE WHEN {row}.ActionType = 'Received' THEN {row}.Quantity ELSE 0 END)"
+    opened = f"(CASE WHEN {row}.ActionType = 'Opened' THEN {row}.Quantity ELSE 0 END)"
+    return f"""
+    UPDATE ProductStock SET
+        Received = Received {sign} {received},
+        Opened = Opened {sign} {opened},
+        Unopened = Unopened {sign} ({received} - {opened}),
+        Unfinished = Unfinished {sign} ({received} - {opened}),
+        Available = Available {sign} ({received} - {opened})
+    WHERE ProductName = {row}.ProductName;
+    """
+
+# Log table -> ProductStock change for one row, and the columns it depends on
+PRODUCT_STOCK_SOURCES = (
+    ("ConsumableLogs", _consumable_stock_delta, ("ProductName", "DateOpened", "DateFinished")),
+    ("NonConsumableLogs", _non_consumable_stock_delta, ("ProductName", "ActionType", "Quantity")),
+)
+
+def _create_product_stock(cursor):
+    """
+    Migration 3: per-product stock counters kept current by triggers.
+    The guard triggers check these counters instead of summing a product's
+    whole history, and the analytics views read them directly.
+
+    Consumables count lots: Opened/Unopened/Unfinished follow the lot's
+    dates and Available is the number of unfinished lots.
+    Non-consumables count units: Received/Opened are the summed quantities
+    and a unit leaves stock when it is opened, so Unopened, Unfinished and
+    Available are all Received - Opened.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ProductStock (
+        ProductName TEXT PRIMARY KEY
+            REFERENCES Products(ProductName)
+            ON DELETE CASCADE
+            ON UPDATE CASCADE,
+        Received INTEGER NOT NULL DEFAULT 0,
+        Opened INTEGER NOT NULL DEFAULT 0,
+        Unopened INTEGER NOT NULL DEFAULT 0,
+        Unfinished INTEGER NOT NULL DEFAULT 0,
+        Available INTEGER NOT NULL DEFAULT 0
+    ) STRICT;
+    """)
+
+    # ---------- Backfill ----------
+    cursor.execute("DELETE FROM ProductStock;")
+    cursor.execute("""
+    INSERT INTO ProductStock (ProductName, Received, Opened, Unopened, Unfinished, Available)
+    SELECT
+        p.ProductName,
+        COALESCE(c.Received, 0) + COALESCE(n.Received, 0),
+        COALESCE(c.Opened, 0) + COALESCE(n.Opened, 0),
+        COALESCE(c.Unopened, 0) + COALESCE(n.Received, 0) - COALESCE(n.Opened, 0),
+        COALESCE(c.Unfinished, 0) + COALESCE(n.Received, 0) - COALESCE(n.Opened, 0),
+        COALESCE(c.Unfinished, 0) + COALESCE(n.Received, 0) - COALESCE(n.Opened, 0)
+    FROM Products p
+    LEFT JOIN (
+        SELECT
+            ProductName,
+            COUNT(*) AS Received,
+            SUM(COALESCE(DateOpened, '') != '') AS Opened,
+            SUM(DateOpened IS '' AND DateFinished IS '') AS Unopened,
+            SUM(DateFinished IS '') AS Unfinished
+        FROM ConsumableLogs
+        GROUP BY ProductName
+    ) c ON c.ProductName = p.ProductName
+    LEFT JOIN (
         SELECT
-            p.ProductName,
-            COALESCE(SUM(CASE WHEN l.ActionType = 'Received' THEN l.Quantity ELSE 0 END), 0)
-                - COALESCE(SUM(CASE WHEN l.ActionType = 'Opened' THEN l.Quantity ELSE 0 END), 0) AS TotalQuantityAvailable,
-            p.Station,
-            p.IsConsumable
-        FROM Products p
-        LEFT JOIN NonConsumableLogs l
-            ON p.ProductName = l.ProductName
-        WHERE p.IsConsumable = 'n'
-        GROUP BY p.ProductName
-        HAVING TotalQuantityAvailable <= 0
-
-        UNION ALL
+            ProductName,
+            SUM(CASE WHEN ActionType = 'Received' THEN Quantity ELSE 0 END) AS Received,
+            SUM(CASE WHEN ActionType = 'Opened' THEN Quantity ELSE 0 END) AS Opened
+        FROM NonConsumableLogs
+        GROUP BY ProductName
+    ) n ON n.ProductName = p.ProductName;
+    """)
 
+    # ---------- Counter maintenance ----------
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS product_stock_on_product_insert
+    AFTER INSERT ON Products
+    BEGIN
+        INSERT OR IGNORE INTO ProductStock (ProductName) VALUES (NEW.ProductName);
+    END;
+    """)
+
+    for table, delta, tracked_columns in PRODUCT_STOCK_SOURCES:
+        tracked_columns = ", ".join(tracked_columns)
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS product_stock_on_{table}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            {delta("NEW", "+")}
+        END;
+        """)
+
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS product_stock_on_{table}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            {delta("OLD", "-")}
+        END;
+        """)
+
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS product_stock_on_{table}_update
+        AFTER UPDATE OF {tracked_columns} ON {table}
+        BEGIN
+            {delta("OLD", "-")}
+            {delta("NEW", "+")}
+        END;
+        """)
+
+    # ---------- Guard triggers, now O(1) ----------
+    # The guards run BEFORE the write and work out the counters the write
+    # would leave behind, so they don't depend on the order in which SQLite
+    # fires them relative to the maintenance triggers above.
+    cursor.execute("DROP TRIGGER IF EXISTS on_emergency_opened_consumables;")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS on_emergency_opened_consumables
+    BEFORE UPDATE ON ConsumableLogs
+    BEGIN
+        SELECT
+            CASE
+                WHEN
+                    OLD.ProductName = NEW.ProductName AND
+                    OLD.DateOpened = '' AND
+                    NEW.DateOpened != '' AND
+                    (SELECT Unopened FROM ProductStock WHERE ProductName = OLD.ProductName)
+                        - (OLD.DateOpened IS '' AND OLD.DateFinished IS '')
+                        + (NEW.DateOpened IS '' AND NEW.DateFinished IS '')
+                    < (SELECT EmergencyCount FROM Products WHERE ProductName = OLD.ProductName)
+                THEN RAISE(FAIL, 'Attempt to use emergency supplies.')
+            END;
+    END;
+    """)
+
+    cursor.execute("DROP TRIGGER IF EXISTS on_emergency_opened_non_consumables;")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS on_emergency_opened_non_consumables
+    BEFORE INSERT ON NonConsumableLogs
+    BEGIN
+        SELECT
+            CASE
+                WHEN
+                    NEW.ActionType = 'Opened' AND
+                    -- Opening more than is available is limit_nonconsumable_opened's error
+                    (SELECT Available FROM ProductStock WHERE ProductName = NEW.ProductName) >= NEW.Quantity AND
+                    (SELECT Available FROM ProductStock WHERE ProductName = NEW.ProductName) - NEW.Quantity
+                    < (SELECT EmergencyCount FROM Products WHERE ProductName = NEW.ProductName)
+                THEN RAISE(FAIL, 'Attempt to use emergency supplies.')
+            END;
+    END;
+    """)
+
+    old_available = "(CASE WHEN OLD.ActionType = 'Received' THEN OLD.Quantity WHEN OLD.ActionType = 'Opened' THEN -OLD.Quantity ELSE 0 END)"
+    new_available = "(CASE WHEN NEW.ActionType = 'Received' THEN NEW.Quantity WHEN NEW.ActionType = 'Opened' THEN -NEW.Quantity ELSE 0 END)"
+    cursor.execute("DROP TRIGGER IF EXISTS on_update_negative_total;")
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS on_update_negative_total
+    BEFORE UPDATE ON NonConsumableLogs
+    BEGIN
+        SELECT
+            CASE
+                WHEN
+                    (SELECT Available FROM ProductStock WHERE ProductName = NEW.ProductName)
+                        - (CASE WHEN OLD.ProductName = NEW.ProductName THEN {old_available} ELSE 0 END)
+                        + {new_available} < 0
+                    OR (
+                        OLD.ProductName != NEW.ProductName AND
+                        (SELECT Available FROM ProductStock WHERE ProductName = OLD.ProductName) - {old_available} < 0
+                    )
+                THEN RAISE(ABORT, 'Cannot have negative total quantity')
+            END;
+    END;
+    """)
+
+    cursor.execute("DROP TRIGGER IF EXISTS on_delete_negative_total;")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS on_delete_negative_total
+    BEFORE DELETE ON NonConsumableLogs
+    BEGIN
         SELECT
-            p.ProductName,
-            COALESCE(SUM(CASE WHEN l2.DateFinished = '' THEN l2.Quantity ELSE 0 END), 0) AS TotalQuantityAvailable,
-            p.Station,
-            p.IsConsumable
-        FROM Products p
-        LEFT JOIN ConsumableLogs l2
-            ON p.ProductName = l2.ProductName
-        WHERE p.IsConsumable = 'y'
-        GROUP BY p.ProductName
-        HAVING TotalQuantityAvailable <= 0;
+            CASE
+                WHEN (SELECT Available FROM ProductStock WHERE ProductName = OLD.ProductName) - OLD.Quantity < 0
+                THEN RAISE(ABORT, 'Cannot have negative total quantity')
+            END;
+    END;
+    """)
+
+    cursor.execute("DROP TRIGGER IF EXISTS limit_nonconsumable_opened;")
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS limit_nonconsumable_opened
+    BEFORE INSERT ON NonConsumableLogs
+    FOR EACH ROW
+    WHEN NEW.ActionType = 'Opened'
+    BEGIN
+        SELECT
+            CASE
+                WHEN (SELECT Available FROM ProductStock WHERE ProductName = NEW.ProductName) < NEW.Quantity
+                THEN RAISE(ABORT, 'Cannot open more than total received quantity')
+            END;
+    END;
+    """)
+
+    # ---------- Views on top of the counters ----------
+    for view in (
+        "DangerouslyLow", "ReOrderList", "ProductsTotalSupply", "ConsumablesAvailableTotaled",
+        "AvailableNonConsumables", "OutOfStockNonConsumables", "OutOfStockConsumables",
+    ):
+        cursor.execute(f"DROP VIEW IF EXISTS {view};")
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS OutOfStockConsumables AS
+    SELECT p.ProductName
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'y'
+      AND s.Unfinished = 0;
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS OutOfStockNonConsumables AS
+    SELECT
+        p.ProductName,
+        s.Received AS TotalQuantityReceived,
+        s.Opened AS TotalQuantityOpened
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'n'
+      AND s.Available <= 0;
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS AvailableNonConsumables AS
+    SELECT
+        p.ProductName,
+        s.Received AS TotalQuantityReceived,
+        s.Opened AS TotalQuantityOpened,
+        s.Available AS TotalQuantityAvailable,
+        p.Station
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'n'
+      AND s.Available > 0;
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS ConsumablesAvailableTotaled AS
+    SELECT p.ProductName, s.Available AS TotalQuantityAvailable
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'y';
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS ProductsTotalSupply AS
+    SELECT p.ProductName, s.Available AS TotalQuantityAvailable, p.Station, p.IsConsumable, p.UnitOfMeasure
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'y'
+
+    UNION ALL
+
+    SELECT p.ProductName, s.Available, p.Station, p.IsConsumable, p.UnitOfMeasure
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'n';
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS ReOrderList AS
+    SELECT p.ProductName, s.Available AS TotalQuantityAvailable, p.IsConsumable, p.UnitOfMeasure, p.Station, p.LowSupplyCount
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'y'
+      AND s.Available <= p.LowSupplyCount
 
+    UNION ALL
+
+    SELECT p.ProductName, s.Available, p.IsConsumable, p.UnitOfMeasure, p.Station, p.LowSupplyCount
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'n'
+      AND s.Available <= p.LowSupplyCount;
+    """)
+
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS DangerouslyLow AS
+    SELECT p.ProductName, s.Available AS TotalQuantityAvailable, p.IsConsumable, p.UnitOfMeasure, p.Station, p.EmergencyCount
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'y'
+      AND s.Available <= p.EmergencyCount
+
+    UNION ALL
+
+    SELECT p.ProductName, s.Available, p.IsConsumable, p.UnitOfMeasure, p.Station, p.EmergencyCount
+    FROM Products p
+    JOIN ProductStock s ON s.ProductName = p.ProductName
+    WHERE p.IsConsumable = 'n'
+      AND s.Available <= p.EmergencyCount;
+    """)
+
+def _create_paging_indexes(cursor):
+    """
+    Migration 4: indexes matching the default ordering of the log tabs, so
+    a keyset page is an index range read instead of a sort of the table.
+    """
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_ConsumableLogs_DateReceived_id
+    ON ConsumableLogs (DateReceived, id);
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_NonConsumableLogs_Date_id
+    ON NonConsumableLogs (Date, id);
+    """)
+
+# Bumped by the app on every update so edits made from a stale row are
+# detected by primary key instead of by comparing every column.
+ROW_VERSION_COLUMN = "RowVersion"
+VERSIONED_TABLES = ["Products", "ConsumableLogs", "NonConsumableLogs"]
+
+def _add_row_versions(cursor):
+    """
+    Migration 5: a RowVersion counter on every table the app edits.
+    """
+    for table in VERSIONED_TABLES:
+        exists = cursor.execute(
+            "SELECT 1 FROM pragma_table_info(?) WHERE name = ?", (table, ROW_VERSION_COLUMN)
+        ).fetchone()
+        if not exists:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {ROW_VERSION_COLUMN} INTEGER NOT NULL DEFAULT 0")
+
+def _create_import_fingerprints(cursor):
+    """
+    Migration 6: remembers which row each record of the legacy workbook was
+    imported into, and a hash of what it held, so build_db --sync can apply
+    only what changed in the workbook.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ImportFingerprints (
+        TableName TEXT NOT NULL,
+        SourceKey TEXT NOT NULL,
+        RowHash TEXT NOT NULL,
+        RowKey ANY NOT NULL,
+        PRIMARY KEY (TableName, SourceKey)
+    ) STRICT, WITHOUT ROWID;
+    """)
+
+PRODUCTS_FULLTEXT_COLUMNS = ["ProductName", "ItemDescription", "AlsItemNumber", "VendorItemNumber", "VendorNumber", "Station"]
+
+def _create_products_fulltext(cursor):
+    """
+    Migration 7: an FTS5 index over the searchable Products columns.
+    It's an external-content table, so the text isn't stored twice; the
+    triggers keep it in step with Products. Keyed on Products' implicit
+    rowid, which a VACUUM may renumber; replaced by migration 12.
+    """
+    fts_table, columns = "ProductsFts", PRODUCTS_FULLTEXT_COLUMNS
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    old_values = ", ".join(f"old.{col}" for col in columns)
+
+    cursor.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+        {column_list},
+        content='Products',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_on_insert
+    AFTER INSERT ON Products
+    BEGIN
+        INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_on_delete
+    AFTER DELETE ON Products
+    BEGIN
+        INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_on_update
+    AFTER UPDATE OF {column_list} ON Products
+    BEGIN
+        INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+        INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+    END;
+    """)
+
+    cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+# Trigram indexes for substring filters: table -> (FTS5 table, indexed columns)
+TRIGRAM_INDEXES = {
+    "ConsumableLogs": ("ConsumableLogsTrigram", ["LOT", "PONumber", "Comments"]),
+    "NonConsumableLogs": ("NonConsumableLogsTrigram", ["PONumber"]),
+}
+
+def _create_log_trigram_indexes(cursor):
+    """
+    Migration 8: FTS5 trigram indexes over the free-text log columns, so
+    'contains' and 'endswith' filters (LIKE '%...%') don't scan the logs.
+    External content keyed on id, kept in step by triggers.
+    """
+    for table, (fts_table, columns) in TRIGRAM_INDEXES.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{col}" for col in columns)
+        old_values = ", ".join(f"old.{col}" for col in columns)
+
+        cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list},
+            content='{table}',
+            content_rowid='id',
+            tokenize='trigram'
+        );
+        """)
+
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table.lower()}_on_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
+        """)
+
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table.lower()}_on_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END;
+        """)
+
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table.lower()}_on_update
+        AFTER UPDATE OF {column_list} ON {table}
+        BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
         """)
 
-    conn.commit()
-    conn.close()
+        cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+# Tables whose writes are counted in TableChanges, so another client can
+# tell which tables changed (see watcher.py). ProductStock is kept up to date by
+# triggers, but views read it directly.
+CHANGE_TRACKED_TABLES = ["Products", "ConsumableLogs", "NonConsumableLogs", "ProductStock"]
+
+def _create_table_changes(cursor):
+    """
+    Migration 9: a per-table write counter, bumped by triggers on every
+    insert, update and delete.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS TableChanges (
+        TableName TEXT PRIMARY KEY,
+        ChangeCount INTEGER NOT NULL DEFAULT 0
+    ) STRICT, WITHOUT ROWID;
+    """)
+
+    for table in CHANGE_TRACKED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO TableChanges (TableName) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table.lower()}_changes_on_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE TableChanges SET ChangeCount = ChangeCount + 1 WHERE TableName = '{table}';
+            END;
+            """)
+
+def _add_import_row_versions(cursor):
+    """
+    Migration 10: the RowVersion each imported row had when build_db --sync
+    last wrote or adopted it. A sync leaves rows whose RowVersion has moved
+    since then (edited in the app) alone. Fingerprints from before this
+    step have NULL, which counts as edited.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM pragma_table_info('ImportFingerprints') WHERE name = ?", (ROW_VERSION_COLUMN,)
+    ).fetchone()
+    if not exists:
+        cursor.execute(f"ALTER TABLE ImportFingerprints ADD COLUMN {ROW_VERSION_COLUMN} INTEGER")
+
+def _create_row_version_triggers(cursor):
+    """
+    Migration 11: bump RowVersion on every update, whoever makes it. Older
+    clients don't set it themselves, and their edits must still make a
+    stale save from a newer client miss. Updates that already bump it (the
+    app, build_db --sync) leave the trigger alone.
+    """
+    for table in VERSIONED_TABLES:
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table.lower()}_bump_row_version
+        AFTER UPDATE ON {table}
+        WHEN NEW.{ROW_VERSION_COLUMN} = OLD.{ROW_VERSION_COLUMN}
+        BEGIN
+            UPDATE {table} SET {ROW_VERSION_COLUMN} = {ROW_VERSION_COLUMN} + 1 WHERE rowid = NEW.rowid;
+        END;
+        """)
+
+# Full-text indexes: relation -> (FTS5 table, indexed columns)
+FULLTEXT_INDEXES = {
+    "Products": ("ProductsSearch", PRODUCTS_FULLTEXT_COLUMNS),
+}
+
+# relation -> (table giving each row a stable integer id in its full-text
+# index, the relation's key column)
+FULLTEXT_KEYS = {
+    "Products": ("ProductsSearchKeys", "ProductName"),
+}
+
+def _rekey_products_fulltext(cursor):
+    """
+    Migration 12: replaces ProductsFts, keyed on Products' implicit rowid,
+    with ProductsSearch, keyed on ProductsSearchKeys.SearchId. That is an
+    INTEGER PRIMARY KEY, which VACUUM never renumbers, so the index can't
+    drift from Products. ProductsSearch stores its own copy of the text;
+    Products is small.
+    """
+    for trigger in ("products_fts_on_insert", "products_fts_on_delete", "products_fts_on_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP TABLE IF EXISTS ProductsFts")
+
+    fts_table, columns = FULLTEXT_INDEXES["Products"]
+    key_table, key_column = FULLTEXT_KEYS["Products"]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    search_id = f"(SELECT SearchId FROM {key_table} WHERE {key_column} = new.{key_column})"
+
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {key_table} (
+        SearchId INTEGER PRIMARY KEY,
+        {key_column} TEXT NOT NULL UNIQUE
+    );
+    """)
+
+    cursor.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+        {column_list},
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_on_insert
+    AFTER INSERT ON Products
+    BEGIN
+        INSERT INTO {key_table}({key_column}) VALUES (new.{key_column});
+        INSERT INTO {fts_table}(rowid, {column_list}) VALUES ({search_id}, {new_values});
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_on_delete
+    AFTER DELETE ON Products
+    BEGIN
+        DELETE FROM {fts_table} WHERE rowid = (SELECT SearchId FROM {key_table} WHERE {key_column} = old.{key_column});
+        DELETE FROM {key_table} WHERE {key_column} = old.{key_column};
+    END;
+    """)
+
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_on_update
+    AFTER UPDATE OF {column_list} ON Products
+    BEGIN
+        UPDATE {key_table} SET {key_column} = new.{key_column} WHERE {key_column} = old.{key_column};
+        UPDATE {fts_table} SET {", ".join(f"{col} = new.{col}" for col in columns)} WHERE rowid = {search_id};
+    END;
+    """)
+
+    # Re-runnable: start the index over from what Products holds now
+    cursor.execute(f"DELETE FROM {fts_table}")
+    cursor.execute(f"DELETE FROM {key_table} WHERE {key_column} NOT IN (SELECT {key_column} FROM Products)")
+    cursor.execute(f"INSERT OR IGNORE INTO {key_table}({key_column}) SELECT {key_column} FROM Products ORDER BY rowid")
+    cursor.execute(f"""
+    INSERT INTO {fts_table}(rowid, {column_list})
+    SELECT k.SearchId, {", ".join(f"p.{col}" for col in columns)}
+    FROM Products p JOIN {key_table} k ON k.{key_column} = p.{key_column}
+    """)
+
+# Ordered schema migrations. MIGRATIONS[n - 1] upgrades a database from
+# PRAGMA user_version n - 1 to n, and each one runs in its own transaction.
+# Databases created before migrations existed report user_version 0 while
+# already holding most of the baseline, so every step must be safe to re-run.
+# Never edit a shipped step; append a new one.
+def _guard_product_stock_updates(cursor):
+    """
+    Migration 13: the app saves every column of a row, so UPDATE OF alone
+    fired the ProductStock triggers on every log edit, rewriting the
+    counters and bumping ProductStock's change count (refreshing the
+    analytics views) even for a comment. Only fire when a counted value
+    actually changed.
+    """
+    for table, delta, tracked_columns in PRODUCT_STOCK_SOURCES:
+        changed = " OR ".join(f"OLD.{col} IS NOT NEW.{col}" for col in tracked_columns)
+        cursor.execute(f"DROP TRIGGER IF EXISTS product_stock_on_{table}_update;")
+        cursor.execute(f"""
+        CREATE TRIGGER product_stock_on_{table}_update
+        AFTER UPDATE OF {", ".join(tracked_columns)} ON {table}
+        WHEN {changed}
+        BEGIN
+            {delta("OLD", "-")}
+            {delta("NEW", "+")}
+        END;
+        """)
+
+MIGRATIONS = [
+    _create_baseline_schema,
+    _create_log_indexes,
+    _create_product_stock,
+    _create_paging_indexes,
+    _add_row_versions,
+    _create_import_fingerprints,
+    _create_products_fulltext,
+    _create_log_trigram_indexes,
+    _create_table_changes,
+    _add_import_row_versions,
+    _create_row_version_triggers,
+    _rekey_products_fulltext,
+    _guard_product_stock_updates,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _drop_triggers_and_views(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('trigger', 'view')").fetchall()
+        for object_type, name in rows:
+            conn.execute(f'DROP {object_type.upper()} IF EXISTS "{name}"')
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def migrate(conn):
+    """
+    Applies every migration newer than the database's user_version, in order.
+    Returns the number of migrations applied.
+    """
+    applied = 0
+    for version in range(get_schema_version(conn) + 1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another client may have migrated while we waited for the lock.
+            if get_schema_version(conn) >= version:
+                conn.commit()
+                continue
+            MIGRATIONS[version - 1](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            applied += 1
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def init_db(db_path, test=False):
+    """
+    Brings the database up to SCHEMA_VERSION.
+    A database that is already current costs a single read and no DDL.
+    In test mode every trigger and view is dropped and all migrations are
+    replayed, so local databases pick up edited definitions.
+    """
+    conn = get_connection(db_path)
+
+    if test:
+        _drop_triggers_and_views(conn)
+
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        # Migrated by a newer version of the app; leave it alone.
+        return
+
+    if version < SCHEMA_VERSION:
+        migrate(conn)
+        invalidate_catalog(db_path)
+
+    if test:
+        with conn:
+            _create_test_views(conn.cursor())
+        invalidate_catalog(db_path)
+
+# ---------- Full-text search ----------
+
+def fulltext_query(text):
+    """
+    Turns what the user typed into an FTS5 query: every word must match
+    the start of a token, in any indexed column. Returns None if nothing
+    searchable was typed.
+    """
+    words = text.split()
+    if not words:
+        return None
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+def fulltext_clause(relation_name):
+    """WHERE clause (one ? for the FTS5 query) keeping rows of relation_name that match."""
+    fts_table, _ = FULLTEXT_INDEXES[relation_name]
+    key_table, key_column = FULLTEXT_KEYS[relation_name]
+    return (f"{key_column} IN (SELECT {key_column} FROM {key_table} WHERE SearchId IN "
+            f"(SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?))")
+
+def fulltext_ranked_join(relation_name):
+    """
+    JOIN clause (one ? for the FTS5 query) adding the matches' relevance as
+    ranked.rank, best first when ordered ascending.
+    """
+    fts_table, _ = FULLTEXT_INDEXES[relation_name]
+    key_table, key_column = FULLTEXT_KEYS[relation_name]
+    return (f"JOIN (SELECT {key_table}.{key_column} AS MatchKey, {fts_table}.rank AS rank "
+            f"FROM {fts_table} JOIN {key_table} ON {key_table}.SearchId = {fts_table}.rowid "
+            f"WHERE {fts_table} MATCH ?) AS ranked "
+            f"ON ranked.MatchKey = {relation_name}.{key_column}")
+
+def trigram_clause(relation_name, column, pattern):
+    """
+    WHERE clause (one ? for pattern) for 'column LIKE pattern' answered from
+    the relation's trigram index. Returns None when there's no index on
+    the column or pattern has no run of 3 characters to look up, in which
+    case a plain LIKE is just as fast.
+    """
+    if relation_name not in TRIGRAM_INDEXES:
+        return None
+    fts_table, columns = TRIGRAM_INDEXES[relation_name]
+    if column not in columns:
+        return None
+    if max((len(part) for part in re.split(r"[%_]", pattern)), default=0) < 3:
+        return None
+    return f"id IN (SELECT rowid FROM {fts_table} WHERE {column} LIKE ?)"
+
+# ---------- Query plan check ----------
+
+# Views whose whole point is to list every row of a log table.
+FULL_SCAN_ALLOWED = {
+    "ConsumablesReport": {"ConsumableLogs"},
+}
+
+# Tables that grow with history. Views may walk Products (that's the catalog
+# they report on) but must reach these through an index.
+HISTORY_TABLES = {"ConsumableLogs", "NonConsumableLogs"}
+
+def _trigger_statements(trigger_sql):
+    """
+    Splits a trigger body into standalone statements that can be EXPLAINed:
+    NEW./OLD. references become parameters and RAISE(...) becomes NULL.
+    """
+    match = re.search(r"\bBEGIN\b(.*)\bEND\b", trigger_sql, re.S | re.I)
+    if not match:
+        return []
+    body = re.sub(r"--[^\n]*", "", match.group(1))
+    body = re.sub(r"\bRAISE\s*\([^)]*\)", "NULL", body, flags=re.I)
+    body = re.sub(r"\b(NEW|OLD)\.\w+", "?", body, flags=re.I)
+    return [statement.strip() for statement in body.split(";") if statement.strip()]
+
+def get_full_scans(conn, sql, params=()):
+    """
+    Returns the names of the tables that `sql` walks from start to end.
+    Works on the bytecode rather than EXPLAIN QUERY PLAN text, so aliases
+    reused across nested views can't hide which table is being scanned:
+    a cursor opened on a table or index b-tree and then rewound is a full scan,
+    a cursor that is only ever seeked is an index lookup.
+    """
+    rootpages = {
+        rootpage: tbl_name
+        for tbl_name, rootpage in conn.execute(
+            "SELECT tbl_name, rootpage FROM sqlite_master WHERE type IN ('table', 'index') AND rootpage > 0"
+        )
+    }
+    cursors = {}
+    scanned = set()
+    for _, opcode, p1, p2, *_ in conn.execute(f"EXPLAIN {sql}", params):
+        if opcode in ("OpenRead", "ReopenIdx"):
+            cursors[p1] = rootpages.get(p2)
+        elif opcode in ("Rewind", "Last") and cursors.get(p1):
+            scanned.add(cursors[p1])
+    return scanned
+
+def check_query_plans(db_path):
+    """
+    EXPLAINs every view and every statement inside every trigger and raises
+    if any of them falls back to a full scan it isn't allowed to make.
+    Trigger statements may not scan anything; views may scan Products but
+    not the log tables (see FULL_SCAN_ALLOWED for the exceptions).
+    Returns a dict {object name: set of scanned tables} for inspection.
+    """
+    # EXPLAIN never checks the schema cookie, so a cached EXPLAIN statement
+    # keeps describing the old schema. Use a private, uncached connection.
+    conn = sqlite3.connect(db_path, cached_statements=0)
+    try:
+        objects = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE type IN ('view', 'trigger')").fetchall()
+        report, problems = _explain_objects(conn, objects)
+    finally:
+        conn.close()
+
+    if problems:
+        raise RuntimeError("Full table scans found:\n" + "\n".join(problems))
+    return report
+
+def _explain_objects(conn, objects):
+    report = {}
+    problems = []
+    for object_type, name, sql in objects:
+        if object_type == "view":
+            scans = get_full_scans(conn, f'SELECT * FROM "{name}"')
+            forbidden = (scans & HISTORY_TABLES) - FULL_SCAN_ALLOWED.get(name, set())
+        else:
+            scans = set()
+            for statement in _trigger_statements(sql):
+                scans |= get_full_scans(conn, statement, [None] * statement.count("?"))
+            forbidden = scans
+        report[name] = scans
+        if forbidden:
+            problems.append(f"{object_type} {name} scans {', '.join(sorted(forbidden))}")
+    return report, problems
+
+def get_table_changes(db_path):
+    """Returns {table name: change count} for CHANGE_TRACKED_TABLES."""
+    with connection(db_path) as conn:
+        return dict(conn.execute("SELECT TableName, ChangeCount FROM TableChanges").fetchall())
+
+def insert_rows(cursor, table_name, columns, rows):
+    """
+    Inserts rows (sequences of values for columns) into table_name on the
+    caller's transaction and returns the rowids they were given, in order.
+    """
+    column_list = ", ".join(f'"{col}"' for col in columns)
+    placeholders = ", ".join(["?"] * len(columns))
+    cursor.executemany(f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})", rows)
+    inserted = cursor.rowcount
+    # One writer holds the lock, so the new rowids are consecutive
+    last_rowid = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return range(last_rowid - inserted + 1, last_rowid + 1)
 
 def delete_db(db_path):
     """Delete the SQLite database file."""
+    close_connections(db_path)
+    invalidate_catalog(db_path)
     if os.path.exists(db_path):
         os.remove(db_path)
         print(f"Database '{db_path}' deleted successfully.")
     else:
         print(f"Database '{db_path}' does not exist.")
 
+# ---------- Schema catalog ----------
+
+# Tables, views, columns and foreign keys of the whole schema in one round trip.
+CATALOG_SQL = """
+    SELECT 'column', m.name, m.type, p.cid, p.name, p.type, p.pk, NULL,
+           (SELECT schema_version FROM pragma_schema_version)
+    FROM sqlite_master m
+    JOIN pragma_table_info(m.name) p
+    WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%'
+
+    UNION ALL
+
+    SELECT 'foreign_key', m.name, m.type, f.id, f."from", f."table", f."to", f.seq,
+           (SELECT schema_version FROM pragma_schema_version)
+    FROM sqlite_master m
+    JOIN pragma_foreign_key_list(m.name) f
+    WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+
+    ORDER BY 1, 2, 4, 8
+"""
+
+_catalogs = {}  # db_path -> catalog dict
+_catalog_lock = threading.Lock()
+
+def logical_type(column_name, declared_type):
+    """Maps a column to its logical type: 'integer', 'float', 'text' or 'date'."""
+    declared_type = (declared_type or "").upper()
+
+    # Detect integer
+    if "INT" in declared_type or "QUANTITY" in column_name.upper():
+        return "integer"
+    # Detect float/real/numeric
+    elif any(x in declared_type for x in ["REAL", "FLOA", "DOUB"]):
+        return "float"
+    # Detect dates by name
+    elif re.search(r'date', column_name, re.IGNORECASE):
+        return "date"
+    else:
+        return "text"
+
+def load_catalog(db_path):
+    """
+    Reads every table and view, its columns, logical types, primary key
+    and foreign keys.
+
+    Returns:
+        {
+            "schema_version": int,
+            "relations": {
+                name: {
+                    "type": "table" | "view",
+                    "columns": [column names, in order],
+                    "column_types": {column name: logical type},
+                    "primary_key": [column names, in key order],
+                    "foreign_keys": [{"from": col, "table": ref table, "to": ref col}],
+                    "base_tables": [tables the relation reads, through any views],
+                }
+            }
+        }
+    """
+    with connection(db_path) as conn:
+        rows = conn.execute(CATALOG_SQL).fetchall()
+        if rows:
+            schema_version = rows[0][8]
+        else:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        view_sql = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'").fetchall())
+
+    relations = {}
+    primary_keys = {}
+    for kind, relation, relation_type, _, a, b, c, _, _ in rows:
+        rel = relations.setdefault(relation, {
+            "type": relation_type,
+            "columns": [],
+            "column_types": {},
+            "primary_key": [],
+            "foreign_keys": [],
+        })
+        if kind == "column":
+            name, declared_type, pk = a, b, c
+            rel["columns"].append(name)
+            rel["column_types"][name] = logical_type(name, declared_type)
+            if pk:
+                primary_keys.setdefault(relation, []).append((pk, name))
+        else:
+            rel["foreign_keys"].append({"from": a, "table": b, "to": c})
+
+    for relation, pk in primary_keys.items():
+        relations[relation]["primary_key"] = [name for _, name in sorted(pk)]
+
+    for relation, rel in relations.items():
+        rel["base_tables"] = sorted(_base_tables(relation, relations, view_sql))
+
+    return {"schema_version": schema_version, "relations": relations}
+
+def _base_tables(relation, relations, view_sql, visiting=()):
+    """The tables relation reads: itself for a table, or whatever its view SQL names, recursively."""
+    if relation not in view_sql:
+        return {relation}
+    sql = re.sub(r"--[^\n]*", "", view_sql[relation])
+    names = {a or b for a, b in re.findall(r'"([^"]+)"|\b(\w+)\b', sql)}
+    tables = set()
+    for name in names & relations.keys():
+        if name != relation and name not in visiting:
+            tables |= _base_tables(name, relations, view_sql, visiting + (relation,))
+    return tables
+
+def get_catalog(db_path):
+    """
+    Returns the cached schema catalog for db_path.
+    The catalog is only reloaded when PRAGMA schema_version says the schema changed.
+    """
+    with _catalog_lock:
+        catalog = _catalogs.get(db_path)
+
+    if catalog is not None:
+        with connection(db_path) as conn:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if catalog["schema_version"] == schema_version:
+            return catalog
+
+    catalog = load_catalog(db_path)
+    with _catalog_lock:
+        _catalogs[db_path] = catalog
+    return catalog
+
+def invalidate_catalog(db_path=None):
+    with _catalog_lock:
+        if db_path is None:
+            _catalogs.clear()
+        else:
+            _catalogs.pop(db_path, None)
+
+def get_relation_info(relation_name, db_path):
+    relations = get_catalog(db_path)["relations"]
+    if relation_name not in relations:
+        raise ValueError(f"Unknown table or view: {relation_name}")
+    return relations[relation_name]
+
+def get_base_tables(relation_name, db_path):
+    """Returns the tables a table or view reads, e.g. ReOrderList -> Products, ProductStock."""
+    return list(get_relation_info(relation_name, db_path)["base_tables"])
+
 def get_columns(relation_name, db_path):
     """
     Returns a list of column names for a SQLite table or view.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute(f"PRAGMA table_info({relation_name});")
-    rows = cursor.fetchall()
-
-    conn.close()
-
-    # row format:
-    # (cid, name, type, notnull, dflt_value, pk)
-    return [row[1] for row in rows]
+    return list(get_relation_info(relation_name, db_path)["columns"])
 
 def get_column_types(table_name, db_path):
     """
     Returns a dict mapping column name -> logical type: 'integer', 'float', 'text', 'date'
     """
-    types = {}
-    date_pattern = re.compile(r'date', re.IGNORECASE)
-
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        for _, name, col_type, _, _, _ in cursor.fetchall():
-            col_type_upper = col_type.upper()
-
-            # Detect integer
-            if "INT" in col_type_upper or "QUANTITY" in name.upper():
-                types[name] = "integer"
-            # Detect float/real/numeric
-            elif any(x in col_type_upper for x in ["REAL", "FLOA", "DOUB"]):
-                types[name] = "float"
-            # Detect dates by name
-            elif date_pattern.search(name):
-                types[name] = "date"
-            else:
-                types[name] = "text"
+    return dict(get_relation_info(table_name, db_path)["column_types"])
 
-    return types
+def get_primary_key(relation_name, db_path):
+    """
+    Returns the primary key columns of a table. Views have none.
+    """
+    return list(get_relation_info(relation_name, db_path)["primary_key"])
 
 def get_expanded_query(relation_interface, db_path):
     """
@@ -520,45 +1641,28 @@ def get_expanded_query(relation_interface, db_path):
     by LEFT JOINing referenced tables.
     """
     table_name = relation_interface.relation_name
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 1️⃣ Get foreign keys of this table
-    cursor.execute(f"PRAGMA foreign_key_list({table_name})")
-    fks = cursor.fetchall()
-    # Each row: (id, seq, table, from, to, on_update, on_delete, match)
-    # 'from' = column in this table, 'table' = referenced table, 'to' = referenced column
+    relations = get_catalog(db_path)["relations"]
 
     select_cols = [f"{table_name}.*"]  # start with all columns from main table
     join_clauses = []
 
-    for fk in fks:
-        fk_column = fk[3]       # column in this table
-        ref_table = fk[2]       # referenced table
-        ref_column = fk[4]      # referenced column
-
-        # 2️⃣ Get columns from referenced table
-        cursor.execute(f"PRAGMA table_info({ref_table})")
-        ref_cols = cursor.fetchall()
+    for fk in relations[table_name]["foreign_keys"]:
+        fk_column = fk["from"]      # column in this table
+        ref_table = fk["table"]     # referenced table
+        ref_column = fk["to"]       # referenced column
 
-        for col in ref_cols:
-            col_name = col[1]
+        for col_name in relations[ref_table]["columns"]:
             # Exclude the foreign key column itself to avoid duplication
             if col_name != ref_column:
-                alias = f"{fk_column}_{col_name}"
                 select_cols.append(f"{ref_table[0].lower()}.{col_name}")
 
-        # 3️⃣ Add LEFT JOIN for this foreign key
         join_clauses.append(f"LEFT JOIN {ref_table} {ref_table[0].lower()} "
                             f"ON {table_name}.{fk_column} = {ref_table[0].lower()}.{fk_column}")
 
-    # 4️⃣ Build the final SQL
     where_clause, where_params = relation_interface.get_where_clauses_and_params()
     select_clause = ", ".join(select_cols)
     join_clause = " ".join(join_clauses)
     query = f"SELECT {select_clause} FROM {table_name} {join_clause} {where_clause};"
-    conn.close()
     return query, where_params
 
 def get_query(relation_interface, db_path):
@@ -567,13 +1671,7 @@ def get_query(relation_interface, db_path):
     without following foreign keys.
     """
     table_name = relation_interface.relation_name
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Get column names from this table
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [col[1] for col in cursor.fetchall()]
+    columns = get_columns(table_name, db_path)
 
     # Build SELECT clause
     select_clause = ", ".join([f"{table_name}.{col}" for col in columns])
@@ -583,13 +1681,11 @@ def get_query(relation_interface, db_path):
 
     # Final query
     query = f"SELECT {select_clause} FROM {table_name} {where_clause};"
-
-    conn.close()
     return query, where_params
 
 def get_productnames(db_path, relation_name):
     try:
-        with sqlite3.connect(db_path) as conn:
+        with connection(db_path) as conn:
             cursor = conn.cursor()
             
             if "nonconsumable" in relation_name.lower():
@@ -611,7 +1707,7 @@ def get_stations(db_path):
         from the Products table.
         """
         try:
-            with sqlite3.connect(db_path) as conn:
+            with connection(db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT DISTINCT Station
@@ -1,22 +1,75 @@
 import os
+import csv
 import sys
 import subprocess
+import warnings
 import sqlite3
-import pandas as pd  # for export to Excel
+import threading
 from typing import List, Dict, Any
 import DB
+import lookup_cache
+import query_cache
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl import Workbook
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 from openpyxl.utils import get_column_letter
 import copy
 from pathlib import Path
 
+# Rows held in memory at a time while exporting
+EXPORT_BATCH_SIZE = 1000
+
+def fetch_batches(cursor, query, params):
+    """Runs query and yields its rows EXPORT_BATCH_SIZE at a time."""
+    cursor.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+def open_file(path):
+    """Opens an exported file with the system's default application."""
+    if sys.platform.startswith("darwin"):
+        subprocess.call(("open", path))
+    elif os.name == "nt":
+        os.startfile(path)
+    elif os.name == "posix":
+        subprocess.call(("xdg-open", path))
+
+def parquet_values(values, logical_type):
+    """
+    values converted to what a Parquet column of logical_type (see
+    DB.get_column_types) holds: integers, floats, or strings for the rest.
+    SQLite doesn't enforce declared types, so e.g. 3.0 in an INTEGER column
+    or a number in an untyped view column are converted here.
+    """
+    if logical_type == "integer":
+        return [int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
+    if logical_type == "float":
+        return [float(v) if isinstance(v, int) else v for v in values]
+    return [v if v is None or isinstance(v, str) else str(v) for v in values]
+
+def sqlite_sort_key(value):
+    """Orders Python values the way SQLite orders storage classes: NULL, numbers, text, blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
 class RelationInterface:
-    def __init__(self, relation_name: str, default_search_text: str, simple_search_field: str, db_path, order_by=None, default_filters=dict()):
+    def __init__(self, relation_name: str, default_search_text: str, simple_search_field: str, db_path, order_by=None, default_filters=dict(), key_columns=None, page_size=200, search_mode="prefix"):
         self.relation_name = relation_name
         self.db_path = db_path
         self.simple_search_field = simple_search_field
+        # "prefix": simple search matches the start of simple_search_field.
+        # "fulltext": it searches the relation's FTS5 index (DB.FULLTEXT_INDEXES),
+        # best matches first.
+        self.search_mode = search_mode
+        self.fulltext_query = None
         self.filter_dict = default_filters
         self.default_search_text = default_search_text or ""
         self.search_field_text = self.default_search_text
@@ -26,6 +79,15 @@ class RelationInterface:
         self.order_by = order_by
         self.curr_results = []
 
+        # Keyset pagination. key_columns must identify a row; tables default to
+        # their primary key. Relations without a key are loaded in one go.
+        if key_columns is None:
+            key_columns = DB.get_primary_key(relation_name, db_path)
+        self.key_columns = list(key_columns)
+        self.page_size = page_size
+        self.total_count = 0
+        self.has_more = False
+
     def is_filter_active(self):
         inac_str = str(self.inactive_filters)
         cur_str = str(self.filter_dict)
@@ -53,7 +115,13 @@ class RelationInterface:
 
     def on_search_field_changed(self, text):
         self.search_field_text = text
-        if text != "":
+        self.fulltext_query = DB.fulltext_query(text) if self.search_mode == "fulltext" else None
+        if self.fulltext_query is not None:
+            self.filter_dict["simple_search"] = {
+                        "clauses": [DB.fulltext_clause(self.relation_name)],
+                        "params":[self.fulltext_query]
+            }
+        elif text != "" and self.search_mode != "fulltext":
             self.filter_dict["simple_search"] = {
                         "clauses": [f"{self.simple_search_field} LIKE ?"],
                         "params":[f"{text}%"]
@@ -79,8 +147,28 @@ class RelationInterface:
         except IndexError:
             raise ValueError(f"Item index {item_index} out of range")
 
+    def get_row_filter(self, item):
+        """
+        WHERE clause and params addressing the stored row behind item.
+        Tables are addressed by primary key, plus RowVersion so the write
+        misses if someone changed the row since it was loaded. Relations
+        without a primary key fall back to matching every column.
+        """
+        primary_key = DB.get_primary_key(self.relation_name, self.db_path)
+        if not primary_key:
+            return (" AND ".join([f"{col}=?" for col in item.keys()]), list(item.values()))
+
+        columns = list(primary_key)
+        if DB.ROW_VERSION_COLUMN in item:
+            columns.append(DB.ROW_VERSION_COLUMN)
+        return (" AND ".join([f"{col}=?" for col in columns]), [item[col] for col in columns])
+
     def on_item_updated(self, item_index: int, item_details: Dict[str, Any]):
-        """Update the row in the database with new details"""
+        """
+        Update the row in the database with new details.
+        Returns the change to curr_results (see splice_result), or None if
+        the results were re-searched instead.
+        """
         try:
             item = self.curr_results[item_index]
         except IndexError:
@@ -89,55 +177,197 @@ class RelationInterface:
         self.validate_date_inputs(item_details)
         # Build UPDATE statement
         set_clause = ", ".join([f"{col}=?" for col in item_details.keys()])
-        where_clause = " AND ".join([f"{col}=?" for col in item.keys()])
-        params = list(item_details.values()) + list(item.values())
+        # Writers that don't bump RowVersion get it bumped by a trigger
+        if DB.ROW_VERSION_COLUMN in item:
+            set_clause += f", {DB.ROW_VERSION_COLUMN}={DB.ROW_VERSION_COLUMN}+1"
+        where_clause, where_params = self.get_row_filter(item)
+        params = list(item_details.values()) + where_params
         query = f"UPDATE {self.relation_name} SET {set_clause} WHERE {where_clause}"
+        primary_key = DB.get_primary_key(self.relation_name, self.db_path)
+        if primary_key:
+            query += f" RETURNING {', '.join(primary_key)}"
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA foreign_keys = ON;")
+        with DB.connection(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
-            if cursor.rowcount == 0:
+            returned = cursor.fetchall() if primary_key else cursor.rowcount
+            if not returned:
                 raise ValueError(f"Item not found. Someone likely recently updated the item.")
+            if primary_key:
+                new_row = self.fetch_matching_row(cursor, primary_key, returned[0])
+        self.notify_write()
 
-        self.curr_results = self.on_search_clicked()  # refresh
+        if not primary_key:
+            self.curr_results = self.on_search_clicked()  # refresh
+            return None
+        return self.splice_result(item_index, new_row)
 
     def on_item_delete_clicked(self, item_index: int):
-        """Delete the row at the given index from the database"""
+        """Delete the row at the given index from the database. Returns the change to curr_results."""
         try:
             item = self.curr_results[item_index]
         except IndexError:
             raise ValueError(f"Item index {item_index} out of range")
         
-        where_clause = " AND ".join([f"{col}=?" for col in item.keys()])
+        where_clause, params = self.get_row_filter(item)
         query = f"DELETE FROM {self.relation_name} WHERE {where_clause}"
-        params = list(item.values())
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA foreign_keys = ON;")
+        with DB.connection(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
+            if cursor.rowcount == 0:
+                raise ValueError(f"Item not found. Someone likely recently updated the item.")
+        self.notify_write()
 
-        self.curr_results = self.on_search_clicked()
+        return self.splice_result(item_index, None)
     
+    def on_items_delete_clicked(self, item_indexes: List[int]):
+        """
+        Deletes the rows at the given indexes in one transaction. If any of
+        them was changed or removed meanwhile nothing is deleted.
+        Returns None since several rows changed.
+        """
+        item_indexes = sorted(set(item_indexes), reverse=True)
+        try:
+            items = [self.curr_results[index] for index in item_indexes]
+        except IndexError:
+            raise ValueError("Item index out of range")
+        if not items:
+            return None
+
+        where_clause, _ = self.get_row_filter(items[0])
+        query = f"DELETE FROM {self.relation_name} WHERE {where_clause}"
+
+        with DB.connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.executemany(query, [self.get_row_filter(item)[1] for item in items])
+            if cursor.rowcount != len(items):
+                raise ValueError(f"Item not found. Someone likely recently updated the item.")
+        self.notify_write()
+
+        if self.is_ranked():
+            self.curr_results = self.on_search_clicked()
+            return None
+        for index in item_indexes:
+            self.splice_result(index, None)
+        return None
+
     def on_create_item_clicked(self, details: dict):
-        """Insert a new row into the database. Returns (status, user_message, error_details)."""
+        """Insert a new row into the database. Returns the change to curr_results, or None if re-searched."""
         self.validate_date_inputs(details)
         columns = ", ".join(details.keys())
         placeholders = ", ".join(["?"] * len(details))
         params = list(details.values())
 
         query = f"INSERT INTO {self.relation_name} ({columns}) VALUES ({placeholders})"
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA foreign_keys = ON;")
+        primary_key = DB.get_primary_key(self.relation_name, self.db_path)
+        if primary_key:
+            query += f" RETURNING {', '.join(primary_key)}"
+
+        with DB.connection(self.db_path) as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
+            if primary_key:
+                new_row = self.fetch_matching_row(cursor, primary_key, cursor.fetchone())
+        self.notify_write()
+
+        if not primary_key:
+            self.curr_results = self.on_search_clicked()
+            return None
+        return self.splice_result(None, new_row)
+
+    def on_create_items_clicked(self, details: dict, quantity: int):
+        """
+        Inserts quantity identical rows in one transaction, e.g. receiving a
+        shipment of lots. Returns None since several rows changed.
+        """
+        self.validate_date_inputs(details)
+        params = list(details.values())
+
+        with DB.connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            rowids = DB.insert_rows(cursor, self.relation_name, list(details.keys()), [params] * quantity)
+            where_clause, where_params = self.get_where_clauses_and_params()
+            rowid_clause = f"{self.relation_name}.rowid BETWEEN ? AND ?"
+            where_clause = f"{where_clause} AND {rowid_clause}" if where_clause else f"WHERE {rowid_clause}"
+            new_rows = self._fetch_dicts(cursor, (f"SELECT * FROM {self.relation_name} {where_clause}", where_params + [rowids[0], rowids[-1]]))
+        self.notify_write()
+
+        if self.is_ranked():
+            self.curr_results = self.on_search_clicked()
+            return None
+        for row in new_rows:
+            self.splice_result(None, row)
+        return None
+
+    def notify_write(self):
+        """Called after every committed write through this interface."""
+        if self.relation_name in lookup_cache.SOURCE_TABLES:
+            lookup_cache.invalidate(self.db_path)
+
+    # ---- Write-through ----
+    # Writes patch curr_results with the one row they touched instead of
+    # re-running the search. The row is re-read by primary key under the
+    # active filter, so a row that stops (or starts) matching is handled too.
+
+    def fetch_matching_row(self, cursor, primary_key, key_values):
+        """Point lookup of a row by primary key, or None if it doesn't match the active filter."""
+        where_clause, params = self.get_where_clauses_and_params()
+        key_clause = " AND ".join([f"{self.relation_name}.{col}=?" for col in primary_key])
+        where_clause = f"{where_clause} AND {key_clause}" if where_clause else f"WHERE {key_clause}"
+        cursor.execute(f"SELECT * FROM {self.relation_name} {where_clause}", params + list(key_values))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        columns = [desc[0] for desc in cursor.description]
+        return dict(zip(columns, row))
+
+    def splice_result(self, old_index, new_row):
+        """
+        Removes curr_results[old_index] (if given) and inserts new_row (if
+        given) where the search's ordering would put it. Returns the change
+        as {"removed": index or None, "inserted": index or None}.
+        """
+        if self.is_ranked():
+            # Relevance can't be compared in Python; ask SQLite again
+            self.curr_results = self.on_search_clicked()
+            return None
+
+        change = {"removed": None, "inserted": None}
+        if old_index is not None:
+            del self.curr_results[old_index]
+            self.total_count -= 1
+            change["removed"] = old_index
+
+        if new_row is not None:
+            self.total_count += 1
+            index = self.get_insertion_index(new_row)
+            # Rows sorting after everything loaded arrive with a later page
+            if index < len(self.curr_results) or not self.has_more:
+                self.curr_results.insert(index, new_row)
+                change["inserted"] = index
+        return change
+
+    def get_insertion_index(self, row):
+        """Binary search for row's position in curr_results under the search's ordering."""
+        terms = self.get_order_terms()
+
+        def precedes(a, b):
+            for _, column, descending in terms:
+                key_a, key_b = sqlite_sort_key(a[column]), sqlite_sort_key(b[column])
+                if key_a != key_b:
+                    return (key_a < key_b) != descending
+            return False
+
+        low, high = 0, len(self.curr_results)
+        while low < high:
+            middle = (low + high) // 2
+            if precedes(row, self.curr_results[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
 
-        self.curr_results = self.on_search_clicked()
-    
     def validate_date_inputs(self, details):
 
         def is_valid_date(value: str) -> bool:
@@ -190,60 +420,260 @@ class RelationInterface:
     def before_search_clicked(self):
         pass
 
+    def is_ranked(self):
+        """True while a full-text search is active; results are then ordered by relevance."""
+        return self.fulltext_query is not None
+
     def get_sql(self):
-        query = f"SELECT * FROM {self.relation_name} "
         where_clause, params = self.get_where_clauses_and_params()
+        if self.is_ranked():
+            query = f"SELECT {self.relation_name}.* FROM {self.relation_name} {DB.fulltext_ranked_join(self.relation_name)}"
+            return (f"{query} {where_clause} ORDER BY ranked.rank", [self.fulltext_query] + params)
+        query = f"SELECT * FROM {self.relation_name} "
         return (f"{query} {where_clause} {f"ORDER BY {self.order_by}" if self.order_by is not None else ""}", params)
 
-    def on_search_clicked(self) -> List[Dict[str, Any]]:
+    def is_paged(self):
+        # Relevance isn't a column, so ranked results can't be seeked; they're small anyway
+        return bool(self.key_columns) and not self.is_ranked()
+
+    def get_order_terms(self):
+        """
+        Returns [(sql expression, result column, descending)] for order_by
+        followed by any key column it doesn't already mention, so the
+        ordering is total and can be used as a keyset.
+        """
+        terms = []
+        for term in (self.order_by or "").split(","):
+            term = term.strip()
+            if not term:
+                continue
+            parts = term.rsplit(None, 1)
+            descending = len(parts) == 2 and parts[1].upper() == "DESC"
+            expression = parts[0] if len(parts) == 2 and parts[1].upper() in ("ASC", "DESC") else term
+            terms.append((expression, expression.strip('"'), descending))
+
+        ordered_columns = {column for _, column, _ in terms}
+        tie_break_descending = terms[-1][2] if terms else False
+        for key in self.key_columns:
+            if key not in ordered_columns:
+                terms.append((f'"{key}"', key, tie_break_descending))
+        return terms
+
+    def get_seek_ranges(self, terms, after_row):
+        """
+        The rows that follow after_row under terms, as disjoint conditions
+        [(sql, params)]: equality on a prefix of the ordering plus one range
+        on the next term, so each can seek an index on the ordering columns.
+        NULL sorts first, as in SQLite, and is matched with IS / IS NULL
+        since a plain comparison with NULL matches nothing.
+        """
+        ranges = []
+        values = [after_row[column] for _, column, _ in terms]
+        for i, ((expr, _, descending), value) in enumerate(zip(terms, values)):
+            prefix = [f"{prev_expr} IS ?" for prev_expr, _, _ in terms[:i]]
+            if value is None:
+                # Nothing sorts before NULL
+                afters = [] if descending else [(f"{expr} IS NOT NULL", [])]
+            elif descending:
+                afters = [(f"{expr} < ?", [value]), (f"{expr} IS NULL", [])]
+            else:
+                afters = [(f"{expr} > ?", [value])]
+            for condition, condition_params in afters:
+                ranges.append((" AND ".join(prefix + [condition]), values[:i] + condition_params))
+        return ranges
+
+    def get_page_sql(self, after_row=None):
+        """
+        SQL for the page that follows after_row (the first page if None).
+        Seeks on the ordering columns instead of using OFFSET, so every page
+        costs the same no matter how deep into the relation it is.
+        Fetches one extra row to tell whether there is another page.
+        """
+        where_clause, params = self.get_where_clauses_and_params()
+        terms = self.get_order_terms()
+        order_clause = ", ".join(f"{expr} {'DESC' if descending else 'ASC'}" for expr, _, descending in terms)
+        limit = self.page_size + 1
+
+        if after_row is None:
+            query = f"SELECT * FROM {self.relation_name} {where_clause} ORDER BY {order_clause} LIMIT ?"
+            return (query, params + [limit])
+
+        # One seek per range; each returns at most a page, and the union is
+        # ordered again, which sorts a few pages' worth of rows at most.
+        selects = []
+        select_params = []
+        for condition, condition_params in self.get_seek_ranges(terms, after_row):
+            range_clause = f"{where_clause} AND {condition}" if where_clause else f"WHERE {condition}"
+            selects.append(f"SELECT * FROM (SELECT * FROM {self.relation_name} {range_clause} ORDER BY {order_clause} LIMIT ?)")
+            select_params += params + condition_params + [limit]
+        if not selects:
+            selects.append(f"SELECT * FROM {self.relation_name} WHERE 0")
+        query = f"SELECT * FROM ({' UNION ALL '.join(selects)}) ORDER BY {order_clause} LIMIT ?"
+        return (query, select_params + [limit])
+
+    def get_count_sql(self):
+        where_clause, params = self.get_where_clauses_and_params()
+        return (f"SELECT COUNT(*) FROM {self.relation_name} {where_clause}", params)
+
+    def _fetch_dicts(self, cursor, sql):
+        cursor.execute(*sql)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _fetch_cached(self, cursor, sql, version):
+        """
+        _fetch_dicts through query_cache. version is DB.change_counter(),
+        read before querying so a write landing meanwhile can't be cached
+        under the newer counter. None bypasses the cache.
+        """
+        if version is None:
+            return self._fetch_dicts(cursor, sql)
+        key = (self.db_path, version, sql[0], tuple(sql[1]))
+        hit, rows = query_cache.get(key)
+        if not hit:
+            rows = self._fetch_dicts(cursor, sql)
+            query_cache.put(key, rows)
+        return rows
+
+    # A search is split in three so the query can run off the Tk thread:
+    # prepare_search() reads the interface's state and builds the SQL,
+    # execute_search() only talks to the database and leaves self alone,
+    # apply_search() stores the results. on_search_clicked() does all three.
+
+    def prepare_search(self):
         self.before_search_clicked()
+        # Setting "cancel" aborts the search while it runs, see DB.cancellable
+        if self.is_paged():
+            return {
+                "paged": True,
+                "page_sql": self.get_page_sql(),
+                "count_sql": self.get_count_sql(),
+                "page_size": self.page_size,
+                "cancel": threading.Event(),
+            }
+        return {"paged": False, "sql": self.get_sql(), "cancel": threading.Event()}
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA foreign_keys = ON;")
+    def execute_search(self, request):
+        """Runs a prepared search. Safe to call from a worker thread."""
+        version = DB.change_counter(self.db_path)
+        with DB.connection(self.db_path) as conn, DB.cancellable(conn, request["cancel"]):
             cursor = conn.cursor()
-            cursor.execute(*self.get_sql())
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-        self.curr_results = [dict(zip(columns, row)) for row in results]
-
-
+            if not request["paged"]:
+                rows = self._fetch_cached(cursor, request["sql"], version)
+                return {"rows": rows, "has_more": False, "total_count": len(rows)}
+
+            rows = self._fetch_cached(cursor, request["page_sql"], version)
+            has_more = len(rows) > request["page_size"]
+            rows = rows[:request["page_size"]]
+            if has_more:
+                total_count = list(self._fetch_cached(cursor, request["count_sql"], version)[0].values())[0]
+            else:
+                total_count = len(rows)
+        return {"rows": rows, "has_more": has_more, "total_count": total_count}
+
+    def apply_search(self, result):
+        self.curr_results = result["rows"]
+        self.has_more = result["has_more"]
+        self.total_count = result["total_count"]
         self.after_search_clicked()
         return self.curr_results
+
+    def on_search_clicked(self) -> List[Dict[str, Any]]:
+        return self.apply_search(self.execute_search(self.prepare_search()))
+
+    def prepare_next_page(self):
+        """Returns the request for the page after the loaded rows, or None if everything is loaded."""
+        if not self.has_more or not self.curr_results:
+            return None
+        return {
+            "page_sql": self.get_page_sql(after_row=self.curr_results[-1]),
+            "page_size": self.page_size,
+            "loaded": len(self.curr_results),
+            "cancel": threading.Event(),
+        }
+
+    def execute_next_page(self, request):
+        """Safe to call from a worker thread."""
+        version = DB.change_counter(self.db_path)
+        with DB.connection(self.db_path) as conn, DB.cancellable(conn, request["cancel"]):
+            rows = self._fetch_cached(conn.cursor(), request["page_sql"], version)
+        return {
+            "rows": rows[:request["page_size"]],
+            "has_more": len(rows) > request["page_size"],
+            "loaded": request["loaded"],
+        }
+
+    def apply_next_page(self, result):
+        """Appends the page to curr_results and returns the new rows (none if the results changed meanwhile)."""
+        if result["loaded"] != len(self.curr_results):
+            return []
+        self.curr_results.extend(result["rows"])
+        self.has_more = result["has_more"]
+        return result["rows"]
+
+    def fetch_next_page(self) -> List[Dict[str, Any]]:
+        """Appends the next page to curr_results and returns the new rows."""
+        request = self.prepare_next_page()
+        if request is None:
+            return []
+        return self.apply_next_page(self.execute_next_page(request))
     
+    def get_export_sql(self, exclude_columns=None):
+        """
+        The current search (filters and order, without paging) restricted
+        to the exported columns. Returns (sql, params, columns).
+        """
+        exclude_columns = set(exclude_columns or []) | {DB.ROW_VERSION_COLUMN}
+        columns = [col for col in DB.get_columns(self.relation_name, self.db_path) if col not in exclude_columns]
+        query, params = self.get_sql()
+        select_clause = ", ".join(f'"{col}"' for col in columns)
+        return (f"SELECT {select_clause} FROM ({query})", params, columns)
+
     def export_as_excel(self, exclude_columns=None, output_path="output.xlsx"):
+        """
+        Streams the current search into an .xlsx file with a write-only
+        workbook, so memory stays bounded however many rows are exported.
+        Column widths come from a max(length()) pass in SQL, since a
+        write-only sheet needs them before the first row.
+        """
         if Path(output_path).exists():
             os.remove(output_path)
 
-        if exclude_columns is None:
-            exclude_columns = []
-        
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA foreign_keys = ON;")
-            cursor = conn.cursor()
-            cursor.execute(*self.get_sql())
-            data = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-
+        query, params, columns = self.get_export_sql(exclude_columns)
 
-        df = pd.DataFrame(data, columns=columns)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
 
-        df = df.drop(columns=exclude_columns, errors="ignore")
-
-        # ---- Write starting at row 8 (7 empty rows above) ----
-        start_row = 7
-        df.to_excel(output_path, index=False, startrow=start_row)
-
-        wb = load_workbook(output_path)
-        ws = wb.active
-
-        max_row = ws.max_row
-        max_col = ws.max_column
+        with DB.connection(self.db_path) as conn:
+            cursor = conn.cursor()
 
-        if max_row > start_row and max_col > 0:
+            # ---- Generous column widths ----
+            lengths = ", ".join(f'max(length("{col}"))' for col in columns)
+            max_lengths = cursor.execute(f"SELECT {lengths} FROM ({query})", params).fetchone()
+            generous_padding = 6
+            for i, col in enumerate(columns):
+                max_length = max(len(col), max_lengths[i] or 0)
+                ws.column_dimensions[get_column_letter(i + 1)].width = max_length + generous_padding
+
+            # ---- Write starting at row 8 (7 empty rows above) ----
+            start_row = 7
+            for _ in range(start_row):
+                ws.append([])
+            ws.append(columns)
+
+            row_count = 0
+            for rows in fetch_batches(cursor, query, params):
+                for row in rows:
+                    ws.append(row)
+                row_count += len(rows)
+
+        if columns:
             header_row = start_row + 1  # Excel row number
-            table_range = f"A{header_row}:{get_column_letter(max_col)}{max_row}"
+            table_range = f"A{header_row}:{get_column_letter(len(columns))}{header_row + row_count}"
 
             table = Table(displayName="ExportTable", ref=table_range)
+            # Write-only sheets can't read the headings back, so name the columns here
+            table.tableColumns = [TableColumn(id=i + 1, name=col) for i, col in enumerate(columns)]
 
             style = TableStyleInfo(
                 name="TableStyleMedium1",
@@ -254,29 +684,79 @@ class RelationInterface:
             )
 
             table.tableStyleInfo = style
-            ws.add_table(table)
-
-        # ---- Generous Auto Resize Columns ----
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-
-            for cell in column:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-
-            generous_padding = 6
-            ws.column_dimensions[column_letter].width = max_length + generous_padding
+            with warnings.catch_warnings():
+                # openpyxl always warns on write-only sheets; the columns are set above
+                warnings.filterwarnings("ignore", message="In write-only mode you must add table columns manually", category=UserWarning)
+                ws.add_table(table)
 
         wb.save(output_path)
 
         print(f"Exported {self.relation_name} to formatted table {output_path}")
-
-        # ---- Auto Open File ----
-        if sys.platform.startswith("darwin"):
-            subprocess.call(("open", output_path))
-        elif os.name == "nt":
-            os.startfile(output_path)
-        elif os.name == "posix":
-            subprocess.call(("xdg-open", output_path))
-
+        open_file(output_path)
+
+    def export_as_csv(self, exclude_columns=None, output_path="output.csv"):
+        """Streams the current search into a UTF-8 CSV file with a header row."""
+        query, params, columns = self.get_export_sql(exclude_columns)
+
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            with DB.connection(self.db_path) as conn:
+                for rows in fetch_batches(conn.cursor(), query, params):
+                    writer.writerows(rows)
+
+        print(f"Exported {self.relation_name} to {output_path}")
+        open_file(output_path)
+
+    def export_as_parquet(self, exclude_columns=None, output_path="output.parquet"):
+        """
+        Streams the current search into a Parquet file, one row group per
+        batch. Column types come from the catalog, so every batch shares
+        one schema. The file is written under a temporary name and only
+        replaces output_path once complete. Needs pyarrow.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow).")
+
+        query, params, columns = self.get_export_sql(exclude_columns)
+        column_types = DB.get_column_types(self.relation_name, self.db_path)
+        logical_types = [column_types.get(col, "text") for col in columns]
+        arrow_types = {"integer": pa.int64(), "float": pa.float64()}
+        schema = pa.schema([pa.field(col, arrow_types.get(logical_type, pa.string())) for col, logical_type in zip(columns, logical_types)])
+
+        partial_path = f"{output_path}.part"
+        writer = pq.ParquetWriter(partial_path, schema)
+        try:
+            with DB.connection(self.db_path) as conn:
+                for rows in fetch_batches(conn.cursor(), query, params):
+                    arrays = [
+                        pa.array(parquet_values(column_values, logical_type), type=field.type)
+                        for column_values, logical_type, field in zip(zip(*rows), logical_types, schema)
+                    ]
+                    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            writer.close()
+            os.replace(partial_path, output_path)
+        except Exception:
+            writer.close()
+            os.remove(partial_path)
+            raise
+
+        print(f"Exported {self.relation_name} to {output_path}")
+        open_file(output_path)
+
+    def export_to_file(self, exclude_columns=None, output_path="output.xlsx"):
+        """Exports the current search in the format given by output_path's extension."""
+        export = EXPORT_FORMATS.get(Path(output_path).suffix.lower())
+        if export is None:
+            raise ValueError(f"Unsupported export format: {Path(output_path).suffix}")
+        getattr(self, export)(exclude_columns=exclude_columns, output_path=output_path)
+
+# File extension -> RelationInterface export method
+EXPORT_FORMATS = {
+    ".xlsx": "export_as_excel",
+    ".csv": "export_as_csv",
+    ".parquet": "export_as_parquet",
+}
@@ -6,17 +6,37 @@ from RelationInterface import RelationInterface
 import random
 import string
 from error_ui import show_error_ui
-from error_handler import run_with_error_handling
+from error_handler import run_with_error_handling, show_exception
+from background import run_in_background
 from tkinter import messagebox
 import time
 import types
 from entry_helpers import attach_datepicker, attach_listpicker, attach_fuzzy_list, attach_helper
 import copy
+import functools
+import heapq
 from tkinter import filedialog, messagebox
 import uuid
 import registry
 from datetime import date
 
+COLUMN_PADDING = " "*5
+# Values measured per column when sizing it, longest (in characters) first
+COLUMN_MEASURE_CANDIDATES = 5
+
+# With live_search, the search runs once typing pauses for this long
+LIVE_SEARCH_DEBOUNCE_MS = 250
+
+_column_font = None
+
+@functools.lru_cache(maxsize=4096)
+def measure_text(text):
+    """Width in pixels of a cell holding text. Cached, Tk font measurements are slow."""
+    global _column_font
+    if _column_font is None:
+        _column_font = tkfont.Font()
+    return _column_font.measure(text+COLUMN_PADDING)
+
 def generate_random_name(length=6):
     letters = string.ascii_uppercase
     digits = string.digits
@@ -24,11 +44,12 @@ def generate_random_name(length=6):
     return f"PROD-{random_part}"
 
 class RelationWidget(ttk.LabelFrame):
-    def __init__(self, master, relation_interface, labels=[], min_width=400, min_height=200, is_view=False, exclude_fields_on_update=[], exclude_fields_on_show=[], exclude_fields_on_create=[], title="Table", padding=10, **kwargs):
+    def __init__(self, master, relation_interface, labels=[], min_width=400, min_height=200, is_view=False, exclude_fields_on_update=[], exclude_fields_on_show=[], exclude_fields_on_create=[], title="Table", padding=10, live_search=False, **kwargs):
         super().__init__(master, text=title, padding=padding, **kwargs)
         self.title=title
         self.relation = relation_interface
-        self.all_columns = DB.get_columns(self.relation.relation_name, self.relation.db_path)
+        # RowVersion is bookkeeping for concurrent edits, never shown or edited
+        self.all_columns = [col for col in DB.get_columns(self.relation.relation_name, self.relation.db_path) if col != DB.ROW_VERSION_COLUMN]
         self.all_column_types = DB.get_column_types(self.relation.relation_name, self.relation.db_path)
         self.exclude_fields_on_update = exclude_fields_on_update
         self.exclude_fields_on_show = exclude_fields_on_show
@@ -40,6 +61,18 @@ class RelationWidget(ttk.LabelFrame):
         self.min_height = min_height
         registry.register(self,labels)
         self.popup = None
+        self.loading_page = False
+        # Bumped by every search so results of a superseded query are dropped
+        self.search_generation = 0
+        # Requests still running on a worker, cancelled when superseded
+        self.search_request = None
+        self.page_request = None
+        # Search as the user types instead of on Enter / button press
+        self.live_search = live_search
+        self.live_search_job = None
+        # Treeview iid -> the values shown for it, see update_table
+        self.row_values = dict()
+        self.iid_counts = dict()
         self.advance_button = None
         self.advanced_search_widgets = None
         self.search_button = None
@@ -54,27 +87,7 @@ class RelationWidget(ttk.LabelFrame):
                         bordercolor="#ADD8E6",
                         foreground="black")
         
-        def resize_columns(tree, results):
-            f = tkfont.Font()
-            max_width = dict()
-            padding=5
-
-            for col in self.all_columns:
-                max_width[col] = f.measure(col+" "*padding)  # small padding
-
-            for item in results:
-                for col, val in item.items():
-                    width = f.measure(str(val)+" "*padding)  # small padding
-                    if width > max_width[col]:
-                        max_width[col] = width
-
-            for col in tree["columns"]:
-                if col in max_width:
-                    tree.column(col, width=max_width[col], stretch=False)
-                    # tree.column(col, stretch=False)
-
-            tree.column(tree["columns"][-1], stretch=True)
-        resize_columns(self.tree, self.relation.curr_results)
+        self.resize_columns(self.relation.curr_results, reset=True)
 
         popup = self.create_popup(title="Advanced Search")
         popup.withdraw()
@@ -145,10 +158,12 @@ class RelationWidget(ttk.LabelFrame):
             self.tree_frame,
             columns = self.show_columns,
             show="headings",
-            yscrollcommand=self.tree_scroll_y.set,
+            yscrollcommand=self.on_tree_scrolled,
             xscrollcommand=self.tree_scroll_x.set
         )
         self.search_entry.bind("<Return>", lambda e: (self.search(e), self.tree.focus_force()))
+        if self.live_search:
+            self.search_entry.bind("<KeyRelease>", self.schedule_live_search, add="+")
 
         self.tree.grid(row=0, column=0, sticky="nsew")
         self.tree_scroll_y.config(command=self.tree.yview)
@@ -161,7 +176,7 @@ class RelationWidget(ttk.LabelFrame):
         self.tree.heading(self.show_columns[-1], text=self.show_columns[-1], anchor="w")
         self.tree.column(self.show_columns[-1], stretch=True)
 
-        self.results_number = tk.Label(self, text=f"Results : {len(self.relation.curr_results)}", anchor="w")
+        self.results_number = tk.Label(self, text=f"Results : {self.relation.total_count}", anchor="w")
         self.results_number.grid(row=2, column=0, columnspan=2, sticky="ew", padx=5, pady=0) 
 
         # Buttons Frame
@@ -310,16 +325,20 @@ class RelationWidget(ttk.LabelFrame):
             default_name = f"{self.relation.relation_name}_{hash_part}.xlsx"
 
             output_path = filedialog.asksaveasfilename(
-                title="Save Excel File As",
+                title="Save Export As",
                 defaultextension=".xlsx",
                 initialfile=default_name,
-                filetypes=[("Excel Files", "*.xlsx")]
+                filetypes=[
+                    ("Excel Files", "*.xlsx"),
+                    ("CSV Files", "*.csv"),
+                    ("Parquet Files", "*.parquet"),
+                ]
             )
 
             if not output_path:
                 return
 
-            self.relation.export_as_excel(
+            self.relation.export_to_file(
                 exclude_columns=exclude_fields,
                 output_path=output_path
             )
@@ -467,12 +486,12 @@ class RelationWidget(ttk.LabelFrame):
                 if pred == "startswith":
                     out["clauses"].append(f"{col} LIKE ?")
                     out["params"].append(f"{value}%")
-                elif pred == "contains":
-                    out["clauses"].append(f"{col} LIKE ?")
-                    out["params"].append(f"%{value}%")
-                elif pred == "endswith":
-                    out["clauses"].append(f"{col} LIKE ?")
-                    out["params"].append(f"%{value}")
+                elif pred in ("contains", "endswith"):
+                    pattern = f"%{value}%" if pred == "contains" else f"%{value}"
+                    # Leading wildcards can't use a b-tree index; use the trigram index where there is one
+                    clause = DB.trigram_clause(self.relation.relation_name, col, pattern)
+                    out["clauses"].append(clause or f"{col} LIKE ?")
+                    out["params"].append(pattern)
                 elif pred == "exactly":
                     out["clauses"].append(f"{col} = ?")
                     out["params"].append(value)
@@ -531,15 +550,14 @@ class RelationWidget(ttk.LabelFrame):
         button_frame.grid(row=len(self.all_columns), column=0, columnspan=3, pady=(15, 0))
 
         def reset_filters():
-            self.refresh()
+            self.refresh(reset_columns=True)
             popup.destroy()
 
         def apply_filters(event=None):
             filters = self.get_filters(advanced_search_widgets, self.all_columns, self.all_column_types)
             self.relation.on_filter_changed(filters)
             self.relation.on_search_field_changed(self.relation.search_field_text)
-            self.relation.on_search_clicked()
-            self.update_table()
+            self.run_search(reset_columns=True)
             popup.destroy()
 
         self.apply_filters_button = ttk.Button(button_frame, text="Apply", command=apply_filters)
@@ -550,20 +568,196 @@ class RelationWidget(ttk.LabelFrame):
         self.popup.deiconify()
         self.hold_popup(popup)
     
-    def refresh(self):
+    def refresh(self, reset_columns=False):
         self.relation.on_search_field_changed(self.relation.default_search_text)
         self.search_entry.delete(0, tk.END)
         self.search_entry.insert(0, self.relation.default_search_text)
         self.relation.on_filter_changed(self.relation.default_filters)
-        self.relation.on_search_clicked()
-        self.update_table()
+        self.run_search(reset_columns)
+
+    def run_search(self, reset_columns=False):
+        """
+        Runs the relation's current search on a worker thread and updates the
+        table when it finishes. Starting a new search supersedes any search
+        or page load still in flight. Columns only widen to fit the results
+        unless reset_columns.
+        """
+        self.search_generation += 1
+        generation = self.search_generation
+        self.cancel_requests()
+        request = self.relation.prepare_search()
+        self.search_request = request
+        self.set_loading(True)
+
+        def done(result):
+            if generation != self.search_generation:
+                return
+            self.search_request = None
+            self.set_loading(False)
+            self.relation.apply_search(result)
+            self.update_table()
+            self.resize_columns(self.relation.curr_results, reset=reset_columns)
+
+        def failed(error):
+            if generation != self.search_generation:
+                return
+            self.search_request = None
+            self.set_loading(False)
+            show_exception(self.master, error)
+
+        run_in_background(self, self.relation.execute_search, done, failed, request)
+
+    def cancel_requests(self):
+        """Aborts the search and page load still running, if any. Their results are dropped anyway."""
+        for request in (self.search_request, self.page_request):
+            if request is not None:
+                request["cancel"].set()
+        self.search_request = None
+        self.page_request = None
+
+    def schedule_live_search(self, event=None):
+        """Restarts the debounce timer; the search runs once typing pauses."""
+        if self.live_search_job is not None:
+            self.after_cancel(self.live_search_job)
+        self.live_search_job = self.after(LIVE_SEARCH_DEBOUNCE_MS, self.run_live_search)
+
+    def run_live_search(self):
+        self.live_search_job = None
+        text = self.search_entry.get()
+        if text == self.relation.search_field_text:
+            return
+        self.relation.on_search_field_changed(text)
+        self.run_search()
+
+    def set_loading(self, loading):
+        if loading:
+            self.results_number.configure(text="Loading...")
+            self.tree.configure(cursor="watch")
+        else:
+            self.results_number.configure(text=f"Results : {self.relation.total_count}")
+            self.tree.configure(cursor="")
                              
+    def resize_columns(self, rows, reset=False):
+        """
+        Widens columns to fit rows, never narrowing them, so widths the user
+        dragged are kept. Only the few longest values (in characters) of each
+        column are measured, which is an approximation with a proportional
+        font but keeps a page to a handful of measurements per column.
+        reset=True starts again from the header widths (first load, or an
+        explicit advanced search / Reset).
+        """
+        for col in self.show_columns:
+            current = measure_text(col) if reset else self.tree.column(col, "width")
+            candidates = heapq.nlargest(COLUMN_MEASURE_CANDIDATES, {str(item[col]) for item in rows}, key=len)
+            width = max(map(measure_text, candidates), default=0)
+            if reset or width > current:
+                self.tree.column(col, width=max(width, current), stretch=(col == self.show_columns[-1]))
+
+    def row_iid(self, item):
+        """
+        Stable Treeview id for a result row: its key columns, or for keyless
+        relations its values plus an occurrence number to tell duplicates apart.
+        """
+        if self.relation.key_columns:
+            return repr(tuple(item[col] for col in self.relation.key_columns))
+        base = str(hash(tuple(item.values())))
+        count = self.iid_counts.get(base, 0)
+        self.iid_counts[base] = count + 1
+        return base if count == 0 else f"{base}#{count}"
+
+    def insert_rows(self, rows):
+        for item in rows:
+            iid = self.row_iid(item)
+            values = [item[col] for col in self.show_columns]
+            self.tree.insert("", tk.END, iid=iid, values=values)
+            self.row_values[iid] = values
+
     def update_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        """
+        Reconciles the tree with curr_results, touching only the rows that
+        were added, removed, changed or moved. Rows keep their iids, so the
+        selection and scroll position survive a refresh.
+        """
+        self.iid_counts = dict()
+        new_rows = []
         for item in self.relation.curr_results:
-            self.tree.insert("", tk.END, values=[item[col] for col in self.show_columns])
-        
+            new_rows.append((self.row_iid(item), [item[col] for col in self.show_columns]))
+        new_iids = {iid for iid, _ in new_rows}
+
+        stale = [iid for iid in self.tree.get_children() if iid not in new_iids]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.row_values[iid]
+
+        # Walk the new order against the old one, moving rows only when they're out of place
+        current = list(self.tree.get_children())
+        position = 0
+        moved = set()
+        for index, (iid, values) in enumerate(new_rows):
+            while position < len(current) and current[position] in moved:
+                position += 1
+            if iid not in self.row_values:
+                self.tree.insert("", index, iid=iid, values=values)
+                self.row_values[iid] = values
+                continue
+            if position < len(current) and current[position] == iid:
+                position += 1
+            else:
+                self.tree.move(iid, "", index)
+                moved.add(iid)
+            if self.row_values[iid] != values:
+                self.tree.item(iid, values=values)
+                self.row_values[iid] = values
+
+        self.update_status()
+
+    def apply_change(self, change):
+        """
+        Mirrors a single-row change to curr_results (from a write, see
+        RelationInterface.splice_result) in the tree. None means the
+        results were re-searched or changed in several places, so the
+        whole table is reconciled.
+        """
+        if change is None or not self.relation.key_columns:
+            self.update_table()
+            return
+
+        removed_iid = None
+        if change["removed"] is not None:
+            removed_iid = self.tree.get_children()[change["removed"]]
+
+        if change["inserted"] is not None:
+            item = self.relation.curr_results[change["inserted"]]
+            iid = self.row_iid(item)
+            values = [item[col] for col in self.show_columns]
+            if iid == removed_iid:
+                # Edited in place: one move at most, one value update
+                if change["removed"] != change["inserted"]:
+                    self.tree.move(iid, "", change["inserted"])
+                removed_iid = None
+            else:
+                if removed_iid is not None:
+                    self.tree.delete(removed_iid)
+                    del self.row_values[removed_iid]
+                    removed_iid = None
+                self.tree.insert("", change["inserted"], iid=iid, values=values)
+            if self.row_values.get(iid) != values:
+                self.tree.item(iid, values=values)
+                self.row_values[iid] = values
+
+        if removed_iid is not None:
+            self.tree.delete(removed_iid)
+            del self.row_values[removed_iid]
+
+        self.update_status()
+
+    def after_write(self, change):
+        """Shows the result of a write made from this widget and refreshes the widgets it affects."""
+        self.apply_change(change)
+        registry.on_write(self)
+
+    def update_status(self):
         widget_status = []
         if self.relation.is_filter_active():
             widget_status.append("(Filtered)")
@@ -571,9 +765,42 @@ class RelationWidget(ttk.LabelFrame):
         else:
             self.tree.configure(style="Treeview")
 
-        self.results_number.configure(text=f"Results : {len(self.relation.curr_results)}")
+        self.results_number.configure(text=f"Results : {self.relation.total_count}")
         self.configure(text=f"{self.title} {" ".join(widget_status)}") 
 
+    def on_tree_scrolled(self, first, last):
+        self.tree_scroll_y.set(first, last)
+        # Fetch the next page once the user is near the bottom of what's loaded
+        if float(last) >= 0.9 and self.relation.has_more:
+            self.after_idle(self.load_more)
+
+    def load_more(self):
+        if self.loading_page or not self.relation.has_more:
+            return
+        request = self.relation.prepare_next_page()
+        if request is None:
+            return
+        self.loading_page = True
+        self.page_request = request
+        generation = self.search_generation
+
+        def done(result):
+            self.loading_page = False
+            if generation != self.search_generation:
+                return
+            self.page_request = None
+            rows = self.relation.apply_next_page(result)
+            self.insert_rows(rows)
+            self.resize_columns(rows)
+
+        def failed(error):
+            self.loading_page = False
+            if generation == self.search_generation:
+                self.page_request = None
+                show_exception(self.master, error)
+
+        run_in_background(self, self.relation.execute_next_page, done, failed, request)
+
     def on_double_click(self, event):
         selected_item = self.tree.focus()  # get selected item ID
         if not selected_item:
@@ -595,7 +822,7 @@ class RelationWidget(ttk.LabelFrame):
         entries = {}
         
         for i, col in enumerate(data.keys()):
-            if col in self.exclude_fields_on_update:
+            if col in self.exclude_fields_on_update or col == DB.ROW_VERSION_COLUMN:
                 continue
             ttk.Label(frame, text=f"{col}:").grid(row=i, column=0, sticky="e", pady=2)
             entry = ttk.Entry(frame)
@@ -609,7 +836,8 @@ class RelationWidget(ttk.LabelFrame):
             new_data = {col: entries[col].get() for col in data.keys() if col in entries}
             selected_index = self.tree.index(self.tree.selection()[0])  # numeric index
             result = run_with_error_handling(self.popup, self.relation.on_item_updated, selected_index, new_data)
-            self.update_table()
+            if result["status"] == "Ok":
+                self.after_write(result["result"])
             self.popup.destroy()
 
 
@@ -636,7 +864,7 @@ class RelationWidget(ttk.LabelFrame):
                 )
 
                 if result["status"] == "Ok":
-                    self.update_table()
+                    self.after_write(result["result"])
                     self.popup.destroy()
         
         # Create an inner frame to hold both buttons
@@ -664,10 +892,12 @@ class RelationWidget(ttk.LabelFrame):
         self.hold_popup(self.popup)
 
     def search(self, event=None):
+        if self.live_search_job is not None:
+            self.after_cancel(self.live_search_job)
+            self.live_search_job = None
         text = self.search_entry.get()
         self.relation.on_search_field_changed(text)
-        self.relation.curr_results = self.relation.on_search_clicked()
-        self.update_table()
+        self.run_search()
         self.tree.focus_set()
 
     def add(self):
@@ -699,7 +929,7 @@ class RelationWidget(ttk.LabelFrame):
             details = {col: entries[col].get() for col in self.create_item_columns}
             result = run_with_error_handling(self.popup, self.relation.on_create_item_clicked, details)
             if result["status"] == "Ok":
-                self.update_table()
+                self.after_write(result["result"])
                 self.popup.destroy() 
 
         ttk.Button(frame, text="Add Item", command=save_item).grid(row=len(self.show_columns)+1, column=0, columnspan=2, pady=10)
@@ -738,13 +968,8 @@ class RelationWidget(ttk.LabelFrame):
             selected = self.tree.selection()
             if not selected:
                 return
-            indexes = []
-            for item in selected:
-                index = self.tree.index(item)
-                indexes.append(index)
-
-            indexes.sort(reverse=True)
-            for index in indexes:
-                run_with_error_handling(self.master, self.relation.on_item_delete_clicked, index)
-            self.update_table()
+            indexes = [self.tree.index(item) for item in selected]
+            result = run_with_error_handling(self.master, self.relation.on_items_delete_clicked, indexes)
+            if result["status"] == "Ok":
+                self.after_write(result["result"])
 
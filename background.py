@@ -0,0 +1,32 @@
+import concurrent.futures
+
+# Worker threads for database reads. Each worker gets its own pooled
+# connection from DB, so queries never run on the Tk main thread.
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-worker")
+
+POLL_INTERVAL_MS = 20
+
+def run_in_background(widget, func, on_done, on_error, *args):
+    """
+    Runs func(*args) on a worker thread and hands its result to on_done (or
+    the exception to on_error) on the Tk main thread.
+    Tk isn't thread-safe, so the worker never touches the UI; the main
+    thread polls the future with widget.after instead.
+    Callbacks are dropped if the widget is destroyed in the meantime.
+    """
+    future = _executor.submit(func, *args)
+
+    def poll():
+        if not widget.winfo_exists():
+            return
+        if not future.done():
+            widget.after(POLL_INTERVAL_MS, poll)
+            return
+        error = future.exception()
+        if error is not None:
+            on_error(error)
+        else:
+            on_done(future.result())
+
+    widget.after(POLL_INTERVAL_MS, poll)
+    return future
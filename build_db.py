@@ -2,6 +2,10 @@ import DB
 import pandas as pd
 import sqlite3
 from datetime import datetime
+import time
+import json
+import hashlib
+import argparse
 
 def insert_excel_to_sqlite(
     excel_path: str,
@@ -23,11 +27,14 @@ def insert_excel_to_sqlite(
     if isinstance(sheet_names, str):
         sheet_names = [sheet_names]
 
+    # One pass over the workbook for every sheet
+    frames = pd.read_excel(excel_path, sheet_name=sheet_names)
+
     with sqlite3.connect(db_path) as conn:
         cursor = conn.cursor()
 
         for sheet in sheet_names:
-            df = pd.read_excel(excel_path, sheet_name=sheet)
+            df = frames[sheet]
 
             # Filter + rename columns if mapping provided
             if include_columns is not None:
@@ -92,7 +99,12 @@ def excel_to_dataframe(file_path, sheet_name: str, include_columns: dict):
 
     # Read only the specified sheet
     df = pd.read_excel(file_path, sheet_name=sheet_name)
+    return select_columns(df, include_columns)
 
+def select_columns(df, include_columns: dict):
+    """
+    Same as excel_to_dataframe for a sheet that has already been read.
+    """
     # Keep only columns that exist
     valid_columns = [col for col in include_columns if col in df.columns]
     df = df[valid_columns]
@@ -113,30 +125,31 @@ def deduplicate(df, col_name="ProductName"):
     
     return df_deduped
 
-if __name__ == "__main__":
-    db_path = "./inventory.db"
-    DB.delete_db(db_path)
-    DB.init_db(db_path)
+# Sheets of the legacy workbook the import uses, read in a single pass
+SOURCE_SHEETS = ["Product_Manager", "Inventory", "Inventory_Detailed"]
+
+def report(message, started=None):
+    """Progress line for the import, with seconds elapsed if started is given."""
+    if started is not None:
+        message = f"{message} ({time.perf_counter() - started:.2f}s)"
+    print(message)
 
-    pm_df = excel_to_dataframe("./test.xlsm", "Product_Manager", {"Product Name":"ProductName", "UOM":"UnitOfMeasure", "Item Description":"ItemDescription", "Station":"Station", "Consumable":"IsConsumable", "Price$":"Price PM", "ALS Item #":"AlsItemNumber", "Vendor #": "VendorNumber", "Vendor Item #": "VendorItemNumber"})
+def frame_rows(df):
+    """DataFrame rows as plain tuples, NaN as None, ready for executemany."""
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+def build_products(sheets):
+    pm_df = select_columns(sheets["Product_Manager"], {"Product Name":"ProductName", "UOM":"UnitOfMeasure", "Item Description":"ItemDescription", "Station":"Station", "Consumable":"IsConsumable", "Price$":"Price PM", "ALS Item #":"AlsItemNumber", "Vendor #": "VendorNumber", "Vendor Item #": "VendorItemNumber"})
     pm_df['ProductName_lower'] = pm_df['ProductName'].str.lower()
-    print(pm_df.head(5))
-    print(pm_df.tail(5))
 
-    id_df = excel_to_dataframe("./test.xlsm", "Inventory", {"Product Name":"ProductName", "Alert number": "LowSupplyCount", "Price": "Price I", "ALS Item #":"AlsItemNumber", "Vendor Item#": "VendorItemNumber"})
-    alert_df = id_df.dropna(subset=["ProductName"])
+    id_df = select_columns(sheets["Inventory"], {"Product Name":"ProductName", "Alert number": "LowSupplyCount", "Price": "Price I", "ALS Item #":"AlsItemNumber", "Vendor Item#": "VendorItemNumber"})
+    alert_df = id_df.dropna(subset=["ProductName"]).copy()
     alert_df['ProductName_lower'] = alert_df['ProductName'].str.lower()
-    print(alert_df.head(5))
-    print(alert_df.tail(5))
-
 
     merged = pd.merge(pm_df, alert_df, on=['ProductName_lower'], how='outer')
-
-    
-    print(f"Merged with duplicates: {len(merged)}")
-    
-    is_consumable_nan_rows = merged[merged['IsConsumable'].isna()]
-    print(f"IsConsumable Nan rows : {len(is_consumable_nan_rows)}")
+    report(f"Merged with duplicates: {len(merged)}")
+    report(f"IsConsumable Nan rows : {merged['IsConsumable'].isna().sum()}")
 
     merged["Price"] = merged["Price I"].fillna(merged["Price PM"])
     merged["ProductName"] = merged["ProductName_x"].fillna(merged["ProductName_y"])
@@ -151,31 +164,17 @@ if __name__ == "__main__":
     merged["AlsItemNumber"] = merged["AlsItemNumber"].fillna("")
     merged["VendorNumber"] = merged["VendorNumber"].fillna("")
 
-    merged = merged.drop(columns=['ProductName_lower'])
-    merged = merged.drop(columns=['ProductName_x'])
-    merged = merged.drop(columns=['ProductName_y'])
-    merged = merged.drop(columns=['Price I'])
-    merged = merged.drop(columns=['Price PM'])
-    merged = merged.drop(columns=['AlsItemNumber_x'])
-    merged = merged.drop(columns=['AlsItemNumber_y'])
-    merged = merged.drop(columns=['VendorItemNumber_x'])
-    merged = merged.drop(columns=['VendorItemNumber_y'])
-    
-    print(merged.columns)
-    print(len(merged))
-    with pd.option_context('display.max_columns', None):
-        print(merged.head(5))
-        print(merged.tail(5))
+    return merged.drop(columns=['ProductName_lower', 'ProductName_x', 'ProductName_y', 'Price I', 'Price PM',
+                                'AlsItemNumber_x', 'AlsItemNumber_y', 'VendorItemNumber_x', 'VendorItemNumber_y'])
 
-    id_df = excel_to_dataframe("./test.xlsm", "Inventory_Detailed", {"Product Name":"ProductName", "LOT":"LOT", "Quantity":"Quantity", "Date Received":"DateReceived", "Date Expired":"ExpiryDate", "Date Opened": "DateOpened", "Date Finished": "DateFinished", "PO#":"PONumber", "ALS Item#": "AlsItemNumber", "Vendor Item #":"VendorItemNumber"})
+def build_consumable_logs(sheets, products):
+    source = sheets["Inventory_Detailed"]
+    id_df = select_columns(source, {"Product Name":"ProductName", "LOT":"LOT", "Quantity":"Quantity", "Date Received":"DateReceived", "Date Expired":"ExpiryDate", "Date Opened": "DateOpened", "Date Finished": "DateFinished", "PO#":"PONumber", "ALS Item#": "AlsItemNumber", "Vendor Item #":"VendorItemNumber"})
     
-    df_source = pd.read_excel("./test.xlsm", sheet_name="Inventory_Detailed")
-    ini = df_source.iloc[:, 5].copy()
-    id_df["ReceivedInitials"] = ini.values
-    ini = df_source.iloc[:, 8].copy()
-    id_df["OpenedInitials"] = ini.values
-    ini = df_source.iloc[:, 10].copy()
-    id_df["FinishedInitials"] = ini.values
+    # The initials columns have no usable headings, so they're taken by position
+    id_df["ReceivedInitials"] = source.iloc[:, 5].values
+    id_df["OpenedInitials"] = source.iloc[:, 8].values
+    id_df["FinishedInitials"] = source.iloc[:, 10].values
 
     id_df['AlsItemNumber'] = id_df['AlsItemNumber'].fillna(0)
     id_df['VendorNumber'] = ""
@@ -183,74 +182,32 @@ if __name__ == "__main__":
     id_df['CertificationDate'] = ""
     id_df['VendorItemNumber'] = id_df['VendorItemNumber'].fillna("")
     id_df['PONumber'] = id_df['PONumber'].fillna("Not Set")
-    id_df['DateReceived'] = id_df['DateReceived'].dt.strftime('%Y-%m-%d')
-    id_df['ExpiryDate'] = id_df['ExpiryDate'].dt.strftime('%Y-%m-%d')
-    id_df['DateOpened'] = id_df['DateOpened'].dt.strftime('%Y-%m-%d')
+    for col in ['DateReceived', 'ExpiryDate', 'DateOpened', 'DateFinished']:
+        id_df[col] = id_df[col].dt.strftime('%Y-%m-%d')
     id_df['DateOpened'] = id_df['DateOpened'].fillna("")
-    id_df['DateFinished'] = id_df['DateFinished'].dt.strftime('%Y-%m-%d')
     id_df['DateFinished'] = id_df['DateFinished'].fillna("")
     id_df['OpenedInitials'] = id_df['OpenedInitials'].fillna("")
     id_df['FinishedInitials'] = id_df['FinishedInitials'].fillna("")
     id_df['CoaFilePath'] = "Not Set"
 
-    with pd.option_context('display.max_columns', None):
-        print(id_df.head(5))
-        print(id_df.tail(5))
-
-    
-    # Create a mapping from df1 lowercase → df1 original casing
-    mapping = merged.set_index(merged['ProductName'].str.lower())['ProductName'].to_dict()
-
-    # Update df2 ProductName using the mapping
+    # Match product names case-insensitively to the Products spelling
+    mapping = products.set_index(products['ProductName'].str.lower())['ProductName'].to_dict()
     id_df['ProductName'] = id_df['ProductName'].str.lower().map(mapping).fillna(id_df['ProductName'])
-    print(f"Number of ConsumableLogs : {len(id_df)}")
 
-    merged["IsConsumable"] = 'n'
-    merged.loc[merged["ProductName"].isin(id_df["ProductName"]), 'IsConsumable'] = 'y'
     id_df['AlsItemNumber'] = id_df['AlsItemNumber'].astype("int64")
     id_df['AlsItemNumber'] = id_df['AlsItemNumber'].replace({0:""})
-    
-    with sqlite3.connect(db_path) as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        merged.to_sql('Products', conn, if_exists='append', index=False)
 
+    # The sheet lists the newest lots first; insert oldest first so ids follow receipt order
+    return id_df.iloc[::-1]
 
-    with sqlite3.connect(db_path) as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        # id_df.to_sql('ConsumableLogs', conn, if_exists='append', index=False)
-        cursor = conn.cursor()
-
-        # Get the existing columns from Products table
-        cursor.execute("PRAGMA table_info(ConsumableLogs)")
-        existing_columns = [info[1] for info in cursor.fetchall()]  # info[1] is column name
-        print(f"Existing columns in table: {existing_columns}")
-
-        # Keep only DataFrame columns that exist in the table
-        df_to_insert = id_df[[col for col in id_df.columns if col in existing_columns]]
-
-        to_insert = []
-        for _, row in df_to_insert.iterrows():
-            to_insert.insert(0, row)
-        # Insert each row
-        for row in to_insert:
-            columns_str = ", ".join(df_to_insert.columns)
-            placeholders = ", ".join(["?"] * len(df_to_insert.columns))
-            data_tuple = tuple(row)
-
-            print(f"Inserting into columns ({columns_str}): {data_tuple}")
-            cursor.execute(f'''
-                INSERT INTO ConsumableLogs ({columns_str})
-                VALUES ({placeholders})
-            ''', data_tuple)
-
-    i_df = excel_to_dataframe("./test.xlsm", "Inventory", {"Product Name":"ProductName", "Quantity":"Quantity" })
+def build_non_consumable_logs(sheets, products):
+    i_df = select_columns(sheets["Inventory"], {"Product Name":"ProductName", "Quantity":"Quantity" })
     i_df = i_df.dropna(subset=["ProductName"])
 
-    mapping = merged.set_index(merged['ProductName'].str.lower())['ProductName'].to_dict()
+    mapping = products.set_index(products['ProductName'].str.lower())['ProductName'].to_dict()
     i_df['ProductName'] = i_df['ProductName'].str.lower().map(mapping).fillna(i_df['ProductName'])
 
-
-    prod_quant = pd.merge(i_df, merged, on=['ProductName'], how='outer')
+    prod_quant = pd.merge(i_df, products, on=['ProductName'], how='outer')
     prod_quant = prod_quant[prod_quant['IsConsumable'] != 'y']
     prod_quant = prod_quant.drop(columns=['IsConsumable', 'UnitOfMeasure', 'ItemDescription',
        'Station', 'LowSupplyCount'])
@@ -259,43 +216,233 @@ if __name__ == "__main__":
     prod_quant["Date"] = "1998-01-01"
     prod_quant["PONumber"] = ""
 
-    na_rows = prod_quant[prod_quant['Quantity'].isna()]
-    
-    with pd.option_context('display.max_columns', None):
-        print(na_rows.head(5))
-
-    print(f"Number of rows that has NaN value at the Quantity column: {len(na_rows)}")
-    
+    report(f"Number of rows that has NaN value at the Quantity column: {prod_quant['Quantity'].isna().sum()}")
     prod_quant = prod_quant.dropna(subset=["Quantity"])
+    report(f"Minimum Quantity : {prod_quant['Quantity'].min()}")
 
-    print(f"Minimum Quantity : {prod_quant["Quantity"].min()}")
-    print(prod_quant.columns)
-    print(prod_quant[prod_quant["Quantity"]==-1.0])
+    return prod_quant[prod_quant["Quantity"] > 0]
 
-    prod_quant = prod_quant[prod_quant["Quantity"] > 0]
-    
-    with sqlite3.connect(db_path) as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        # id_df.to_sql('ConsumableLogs', conn, if_exists='append', index=False)
-        cursor = conn.cursor()
+def load_sources(excel_path):
+    """
+    Reads the legacy workbook once and returns the rows for each table as
+    {table name: DataFrame}, in insertion order.
+    """
+    started = time.perf_counter()
+    sheets = pd.read_excel(excel_path, sheet_name=SOURCE_SHEETS)
+    report(f"Read {', '.join(SOURCE_SHEETS)} from {excel_path}", started)
+
+    products = build_products(sheets)
+    consumable_logs = build_consumable_logs(sheets, products)
+
+    products["IsConsumable"] = 'n'
+    products.loc[products["ProductName"].isin(consumable_logs["ProductName"]), 'IsConsumable'] = 'y'
+
+    return {
+        "Products": products,
+        "ConsumableLogs": consumable_logs,
+        "NonConsumableLogs": build_non_consumable_logs(sheets, products),
+    }
+
+def table_frame(cursor, table_name, df):
+    """Keeps only the DataFrame columns that exist in table_name."""
+    existing_columns = [row[0] for row in cursor.execute("SELECT name FROM pragma_table_info(?)", (table_name,))]
+    return df[[col for col in df.columns if col in existing_columns]]
+
+# Columns identifying a workbook record in each table. Records that share
+# them (several units of one lot) are told apart by their position.
+SOURCE_KEYS = {
+    "Products": ["ProductName"],
+    "ConsumableLogs": ["ProductName", "LOT", "DateReceived"],
+    "NonConsumableLogs": ["ProductName"],
+}
+
+def storage_form(cursor, table_name, columns, rows):
+    """
+    rows as table_name would store them (Excel's 7.0 in a TEXT column is
+    '7.0', in an INTEGER column 7), by passing them through a temporary
+    table with the same column types. Hashes then match rows read back
+    from the database.
+    """
+    column_list = ", ".join(f'"{col}"' for col in columns)
+    cursor.execute("DROP TABLE IF EXISTS temp.SyncSource")
+    cursor.execute(f"CREATE TEMP TABLE SyncSource AS SELECT {column_list} FROM {table_name} WHERE 0")
+    cursor.executemany(f"INSERT INTO temp.SyncSource VALUES ({', '.join(['?'] * len(columns))})", rows)
+    stored = cursor.execute("SELECT * FROM temp.SyncSource ORDER BY rowid").fetchall()
+    cursor.execute("DROP TABLE temp.SyncSource")
+    return stored
+
+def fingerprint(columns, rows, key_columns):
+    """Returns [(source key, row hash, row)] for rows, keyed as in SOURCE_KEYS."""
+    key_indexes = [columns.index(col) for col in key_columns]
+    occurrences = {}
+    records = []
+    for row in rows:
+        key = tuple(row[i] for i in key_indexes)
+        occurrence = occurrences.get(key, 0)
+        occurrences[key] = occurrence + 1
+        source_key = json.dumps([*key, occurrence], default=str)
+        row_hash = hashlib.sha1(json.dumps(row, default=str).encode()).hexdigest()
+        records.append((source_key, row_hash, row))
+    return records
+
+def _adopt_rows(cursor, table_name, primary_key, columns, source_hashes):
+    """
+    Fingerprints for a table imported before fingerprints existed: rows that
+    match a workbook record are claimed as imported. Other rows were made
+    in the app and are left alone.
+    The fingerprint takes the workbook record's hash, not the row's, so a row
+    edited in the app since the old import doesn't look like a workbook edit.
+    """
+    column_list = ", ".join(f'"{col}"' for col in columns)
+    existing = cursor.execute(
+        f'SELECT "{primary_key}", {DB.ROW_VERSION_COLUMN}, {column_list} FROM {table_name} ORDER BY rowid'
+    ).fetchall()
+    records = fingerprint(columns, [row[2:] for row in existing], SOURCE_KEYS[table_name])
+    return {
+        source_key: (source_hashes[source_key], row[0], row[1])
+        for (source_key, _, _), row in zip(records, existing)
+        if source_key in source_hashes
+    }
+
+def compute_delta(cursor, db_path, table_name, df):
+    """
+    Compares the workbook's records for table_name with what was imported
+    last time. Returns the inserts, updates and removals that bring the
+    table in line, plus fingerprints adopted from an older import.
+    """
+    columns = list(df.columns)
+    primary_key = DB.get_primary_key(table_name, db_path)[0]
+    records = fingerprint(columns, storage_form(cursor, table_name, columns, frame_rows(df)), SOURCE_KEYS[table_name])
+    source_hashes = {source_key: row_hash for source_key, row_hash, _ in records}
+
+    # source key -> (row hash, row key, RowVersion when last synced)
+    known = {
+        source_key: (row_hash, row_key, row_version)
+        for source_key, row_hash, row_key, row_version in cursor.execute(
+            f"SELECT SourceKey, RowHash, RowKey, {DB.ROW_VERSION_COLUMN} FROM ImportFingerprints WHERE TableName = ?", (table_name,))
+    }
+    adopted = {}
+    if not known:
+        adopted = known = _adopt_rows(cursor, table_name, primary_key, columns, source_hashes)
+
+    return {
+        "table": table_name,
+        "columns": columns,
+        "primary_key": primary_key,
+        "adopted": adopted,
+        "inserts": [record for record in records if record[0] not in known],
+        "updates": [
+            (known[source_key][1], known[source_key][2], source_key, row_hash, row)
+            for source_key, row_hash, row in records
+            if source_key in known and known[source_key][0] != row_hash
+        ],
+        "removals": [
+            (source_key, row_key, row_version)
+            for source_key, (_, row_key, row_version) in known.items()
+            if source_key not in source_hashes
+        ],
+    }
+
+def apply_removals(cursor, delta):
+    """
+    Deletes the rows of records removed from the workbook, unless they were
+    edited in the app since the last sync (their RowVersion moved). Either
+    way the record's fingerprint goes, and a kept row belongs to the app.
+    """
+    table_name, primary_key = delta["table"], delta["primary_key"]
+    query = f'DELETE FROM {table_name} WHERE "{primary_key}" = ? AND {DB.ROW_VERSION_COLUMN} = ?'
+    if table_name == "Products":
+        # Keep products that still have logs, e.g. ones entered in the app
+        query += " AND NOT EXISTS (SELECT 1 FROM ConsumableLogs WHERE ProductName = ?1) AND NOT EXISTS (SELECT 1 FROM NonConsumableLogs WHERE ProductName = ?1)"
+    delta["kept"] = 0
+    for _, row_key, row_version in delta["removals"]:
+        cursor.execute(query, (row_key, row_version))
+        delta["kept"] += cursor.rowcount == 0
+    cursor.executemany(
+        "DELETE FROM ImportFingerprints WHERE TableName = ? AND SourceKey = ?",
+        [(table_name, source_key) for source_key, _, _ in delta["removals"]]
+    )
+
+def apply_changes(cursor, delta):
+    table_name, columns, primary_key = delta["table"], delta["columns"], delta["primary_key"]
+    fingerprints = [
+        (table_name, source_key, row_hash, row_key, row_version)
+        for source_key, (row_hash, row_key, row_version) in delta["adopted"].items()
+    ]
+
+    set_clause = ", ".join(f'"{col}" = ?' for col in columns)
+    delta["conflicts"] = 0
+    for row_key, row_version, source_key, row_hash, row in delta["updates"]:
+        # A row edited in the app since the last sync keeps the app's edit,
+        # and a row deleted in the app stays deleted
+        updated = cursor.execute(
+            f'UPDATE {table_name} SET {set_clause}, {DB.ROW_VERSION_COLUMN} = {DB.ROW_VERSION_COLUMN} + 1 '
+            f'WHERE "{primary_key}" = ? AND {DB.ROW_VERSION_COLUMN} = ? RETURNING {DB.ROW_VERSION_COLUMN}',
+            list(row) + [row_key, row_version]
+        ).fetchone()
+        if updated is None:
+            delta["conflicts"] += 1
+        else:
+            row_version = updated[0]
+        fingerprints.append((table_name, source_key, row_hash, row_key, row_version))
+
+    inserts = delta["inserts"]
+    if inserts:
+        rowids = DB.insert_rows(cursor, table_name, columns, [row for _, _, row in inserts])
+        if primary_key in columns:
+            key_index = columns.index(primary_key)
+            row_keys = [row[key_index] for _, _, row in inserts]
+        else:
+            row_keys = rowids
+        # New rows start at the column's default RowVersion, 0
+        fingerprints += [(table_name, source_key, row_hash, row_key, 0) for (source_key, row_hash, _), row_key in zip(inserts, row_keys)]
+
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO ImportFingerprints (TableName, SourceKey, RowHash, RowKey, {DB.ROW_VERSION_COLUMN}) VALUES (?, ?, ?, ?, ?)",
+        fingerprints
+    )
+
+def sync_workbook(excel_path, db_path):
+    """
+    Brings the database in line with the legacy workbook, touching only
+    records that were added, changed or removed there since the last
+    import. Rows created in the app are never touched. One transaction.
+    """
+    started = time.perf_counter()
+    sources = load_sources(excel_path)
 
-        # Get the existing columns from Products table
-        cursor.execute("PRAGMA table_info(NonConsumableLogs)")
-        existing_columns = [info[1] for info in cursor.fetchall()]  # info[1] is column name
-        print(f"Existing columns in table: {existing_columns}")
+    with DB.connection(db_path) as conn:
+        cursor = conn.cursor()
+        deltas = [compute_delta(cursor, db_path, table_name, table_frame(cursor, table_name, df)) for table_name, df in sources.items()]
+        report("Computed changes", started)
+
+        # Logs go before the products they reference, and come back after them
+        for delta in reversed(deltas):
+            apply_removals(cursor, delta)
+        for delta in deltas:
+            apply_changes(cursor, delta)
+            report(
+                f"{delta['table']}: {len(delta['inserts'])} inserted, {len(delta['updates']) - delta['conflicts']} updated, "
+                f"{len(delta['removals']) - delta['kept']} removed, {delta['conflicts'] + delta['kept']} kept (edited in the app or still in use)",
+                started
+            )
 
-        # Keep only DataFrame columns that exist in the table
-        df_to_insert = prod_quant[[col for col in prod_quant.columns if col in existing_columns]]
+    report("Sync finished", started)
 
-        # Insert each row
-        for _, row in df_to_insert.iterrows():
-            columns_str = ", ".join(df_to_insert.columns)
-            placeholders = ", ".join(["?"] * len(df_to_insert.columns))
-            data_tuple = tuple(row)
+def import_workbook(excel_path, db_path):
+    """Fills an empty database from the legacy workbook. A sync where every record is new."""
+    sync_workbook(excel_path, db_path)
 
-            print(f"Inserting into columns ({columns_str}): {data_tuple}")
-            cursor.execute(f'''
-                INSERT INTO NonConsumableLogs ({columns_str})
-                VALUES ({placeholders})
-            ''', data_tuple)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the legacy workbook into the inventory database.")
+    parser.add_argument("--sync", action="store_true", help="apply only what changed in the workbook instead of rebuilding the database")
+    args = parser.parse_args()
 
+    db_path = "./inventory.db"
+    if args.sync:
+        DB.init_db(db_path)
+        sync_workbook("./test.xlsm", db_path)
+    else:
+        DB.delete_db(db_path)
+        DB.init_db(db_path)
+        import_workbook("./test.xlsm", db_path)
@@ -2,8 +2,9 @@ from tkcalendar import DateEntry, Calendar
 import tkinter as tk
 from tkinter import ttk, filedialog
 import pyautogui
-from rapidfuzz import fuzz, process
+from rapidfuzz import fuzz, process, utils
 import DB
+import lookup_cache
 import subprocess
 import os
 
@@ -183,18 +184,42 @@ def attach_listpicker(entry, options_list):
 def unattach_all(entry):
     entry.unbind("<FocusIn>")
 
+# Matches shown for a typed query, and how long typing must pause before matching
+FUZZY_LIMIT = 50
+FUZZY_DEBOUNCE_MS = 80
+
+class FuzzyChoices:
+    """
+    A choice list prepared for fuzzy matching. Every choice is normalized
+    (lowercased, punctuation stripped) once here instead of on every keystroke.
+    """
+    def __init__(self, choices):
+        self.choices = list(choices)
+        self.processed = [utils.default_process(str(choice)) for choice in self.choices]
+
+    def top(self, query, limit=FUZZY_LIMIT):
+        """The best `limit` choices for query, best first. Every choice, in order, for an empty query."""
+        query = utils.default_process(query)
+        if not query:
+            return self.choices
+        matches = process.extract(query, self.processed, scorer=fuzz.WRatio, processor=None, limit=limit)
+        return [self.choices[index] for _, _, index in matches]
+
 def attach_fuzzy_list(entry, data):
     """
     Attach a dropdown list picker to a Tkinter Entry widget.
     Dropdown follows the entry if the window moves/resizes.
 
     :param entry: tk.Entry widget
-    :param options_list: list of strings to choose from
+    :param data: list of strings to choose from, or a FuzzyChoices
     """
     dropdown = None
+    choices = data if isinstance(data, FuzzyChoices) else FuzzyChoices(data)
+    pending_update = None
+    update_open_list = None  # update_list of the dropdown currently shown
 
     def show_dropdown(event=None):
-        nonlocal dropdown
+        nonlocal dropdown, update_open_list
         # Prevent multiple popups
         if dropdown and dropdown.winfo_exists():
             return
@@ -237,17 +262,14 @@ def attach_fuzzy_list(entry, data):
             dropdown.lift()
             listbox.delete(0, tk.END)
 
-            query = entry.get()
-
-            matches = sorted(data, key=lambda x: fuzz.ratio(query, x), reverse=True)
-            matches = matches
-            for item in matches:
-                listbox.insert(tk.END, item)
+            matches = choices.top(entry.get())
+            listbox.insert(tk.END, *matches)
 
             visible_rows = max(MIN_VISIBLE, min(len(matches), MAX_VISIBLE))
             listbox.config(height=visible_rows)
 
         update_list()
+        update_open_list = update_list
         frame.pack(fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         listbox.pack(side="left", fill="both", expand=True)
@@ -327,7 +349,23 @@ def attach_fuzzy_list(entry, data):
         parent.bind("<Tab>", lambda e: dropdown.destroy()) 
         parent.bind("<Unmap>", lambda e: dropdown.destroy())
         entry.bind("<Return>", lambda e: dropdown.destroy(), add='+')
-        entry.bind("<KeyRelease>", update_list)
+
+    def schedule_update(event=None):
+        # Match once typing pauses rather than on every key
+        nonlocal pending_update
+        if pending_update is not None:
+            entry.after_cancel(pending_update)
+        pending_update = entry.after(FUZZY_DEBOUNCE_MS, run_update)
+
+    def run_update():
+        nonlocal pending_update
+        pending_update = None
+        if update_open_list is not None:
+            update_open_list()
+
+    # Bound once and added to, so other <KeyRelease> handlers on the entry
+    # (e.g. RelationWidget's live search) keep working
+    entry.bind("<KeyRelease>", schedule_update, add="+")
     return entry.bind("<FocusIn>", show_dropdown)
 
 def attach_filepath_manager(entry):
@@ -456,9 +494,9 @@ def attach_helper(root, entry_name, entry, db_path, relation_name, all_columns,
     if all_column_types[col] == "date":
         attach_datepicker(entry)
     if col == "ProductName":
-        attach_fuzzy_list(entry, DB.get_productnames(db_path, relation_name))
+        attach_fuzzy_list(entry, lookup_cache.get_productnames(db_path, relation_name, prepare=FuzzyChoices))
     elif col == "Station":
-        attach_fuzzy_list(entry, DB.get_stations(db_path))
+        attach_fuzzy_list(entry, lookup_cache.get_stations(db_path, prepare=FuzzyChoices))
     elif col == "IsConsumable":
         attach_fuzzy_list(entry, ["y", "n"])
     elif col == "ActionType":
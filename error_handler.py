@@ -66,6 +66,12 @@ def humanize_error(e: Exception) -> tuple[str, str]:
     
     return (out["Short"],out["Details"])
 
+def show_exception(master, e: Exception):
+    """Shows the error popup for an exception raised outside run_with_error_handling (e.g. on a worker thread)."""
+    short, details = humanize_error("".join(traceback.format_exception(e)))
+    print(details)
+    show_error_ui(short, details, master)
+
 def run_with_error_handling(master, func, *args, **kwargs):
     try:
         result = func(*args, **kwargs)
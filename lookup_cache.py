@@ -0,0 +1,88 @@
+import threading
+import time
+import DB
+
+# The product names and stations offered by the entry helpers, loaded once
+# per database and shared by every form and search bar.
+#
+# Writes made through RelationInterface call invalidate(). Writes from other
+# connections (another user on the share, build_db --sync) show up in
+# PRAGMA data_version, which is checked at most this often:
+DATA_VERSION_RECHECK_SECONDS = 5
+
+# Tables the lookups are read from
+SOURCE_TABLES = {"Products"}
+
+_lookups = {}  # db_path -> {"data_version", "checked_at", "values": {name: list}, "prepared": {}}
+_lookup_lock = threading.Lock()
+
+def _load(db_path):
+    with DB.connection(db_path) as conn:
+        rows = conn.execute("SELECT ProductName, IsConsumable, Station FROM Products ORDER BY ProductName").fetchall()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+
+    return {
+        "data_version": data_version,
+        "checked_at": time.monotonic(),
+        "values": {
+            "productnames": [name for name, _, _ in rows],
+            "productnames_consumable": [name for name, is_consumable, _ in rows if is_consumable == 'y'],
+            "productnames_nonconsumable": [name for name, is_consumable, _ in rows if is_consumable == 'n'],
+            "stations": sorted({station for _, _, station in rows if station is not None}),
+        },
+        "prepared": {},
+    }
+
+def get_lookup(db_path, name, prepare=None):
+    """
+    Returns the cached lookup list `name` for db_path, or prepare(list) if
+    prepare is given. Prepared values are cached too, until the next change.
+    """
+    with _lookup_lock:
+        lookup = _lookups.get(db_path)
+
+    if lookup is not None and time.monotonic() - lookup["checked_at"] >= DATA_VERSION_RECHECK_SECONDS:
+        try:
+            with DB.connection(db_path) as conn:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        except Exception as e:
+            print("Error checking lookups:", e)
+            data_version = lookup["data_version"]
+        if data_version == lookup["data_version"]:
+            lookup["checked_at"] = time.monotonic()
+        else:
+            lookup = None
+
+    if lookup is None:
+        try:
+            lookup = _load(db_path)
+        except Exception as e:
+            print("Error loading lookups:", e)
+            return [] if prepare is None else prepare([])
+        with _lookup_lock:
+            _lookups[db_path] = lookup
+
+    values = lookup["values"][name]
+    if prepare is None:
+        return values
+    if (name, prepare) not in lookup["prepared"]:
+        lookup["prepared"][(name, prepare)] = prepare(values)
+    return lookup["prepared"][(name, prepare)]
+
+def get_productnames(db_path, relation_name, prepare=None):
+    """Product names suited to relation_name: only consumables for ConsumableLogs, and so on."""
+    if "nonconsumable" in relation_name.lower():
+        return get_lookup(db_path, "productnames_nonconsumable", prepare)
+    elif "consumable" in relation_name.lower():
+        return get_lookup(db_path, "productnames_consumable", prepare)
+    return get_lookup(db_path, "productnames", prepare)
+
+def get_stations(db_path, prepare=None):
+    return get_lookup(db_path, "stations", prepare)
+
+def invalidate(db_path=None):
+    with _lookup_lock:
+        if db_path is None:
+            _lookups.clear()
+        else:
+            _lookups.pop(db_path, None)
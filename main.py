@@ -9,6 +9,8 @@ import sqlite3
 import sys
 import ctypes
 import registry
+import query_cache
+import watcher
 import datetime
 import argparse
 from app_version import version
@@ -20,6 +22,12 @@ if __name__ == "__main__":
         action="store_true",
         help="Run in test mode"
     )
+    parser.add_argument(
+        "--watch-interval",
+        type=int,
+        default=watcher.WATCH_INTERVAL_MS,
+        help="How often to check the database for other clients' changes, in ms (0 disables)"
+    )
     args = parser.parse_args()
 
     VERSION = version
@@ -32,8 +40,10 @@ if __name__ == "__main__":
         db_path = "Z:/InventoryAppData/inventory.db"
 
     DB.init_db(db_path, test=TEST_MODE)
+    if TEST_MODE:
+        DB.check_query_plans(db_path)
 
-    with sqlite3.connect(db_path) as conn:
+    with DB.connection(db_path) as conn:
         latest_deployed = DB.get_latest_app_version(conn)
         if latest_deployed < VERSION:
             DB.set_latest_app_version(conn, VERSION)
@@ -76,7 +86,8 @@ if __name__ == "__main__":
             exclude_fields_on_update=["CreatedDateTime"],
             exclude_fields_on_create=["id", "CreatedDateTime"],
             title="Non-consumable Logs",
-            labels=["Logs"]
+            labels=["Logs"],
+            live_search=True
         )
         
         non_cons_widg.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
@@ -98,23 +109,14 @@ if __name__ == "__main__":
             order_by="DateReceived DESC, id DESC",
             db_path=db_path
         )
-        consumables.on_create_item_clicked_original = consumables.on_create_item_clicked
-
         def create_item_quantity_times(obj, details: dict):
-            """Insert a new row into the database. Returns (status, user_message, error_details)."""
-            print("Hey")
+            """Receive Quantity identical lots, one row per lot, in a single transaction."""
             input_quantity = int(details["Quantity"])
             if input_quantity <= 0:
                 raise Exception("Quantity must be > 0")
 
             details["Quantity"] = "1"
-            columns = ", ".join(details.keys())
-            placeholders = ", ".join(["?"] * len(details))
-            params = list(details.values())
-
-            for i in range(input_quantity):
-                obj.on_create_item_clicked_original(details)
-            obj.curr_results = obj.on_search_clicked()
+            return obj.on_create_items_clicked(details, input_quantity)
 
         consumables.on_create_item_clicked = types.MethodType(create_item_quantity_times, consumables)
 
@@ -125,7 +127,8 @@ if __name__ == "__main__":
             exclude_fields_on_update=["CreatedDateTime"],
             exclude_fields_on_create=["id", "CreatedDateTime"],
             title="Consumable Logs",
-            labels=["Logs"]
+            labels=["Logs"],
+            live_search=True
         )
 
         cons_widg.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
@@ -146,6 +149,7 @@ if __name__ == "__main__":
             relation_name="Products",
             default_search_text="",
             simple_search_field="ProductName",
+            search_mode="fulltext",
             db_path=db_path
         )
         
@@ -220,6 +224,7 @@ if __name__ == "__main__":
             default_search_text="",
             order_by='"Date Received" DESC, "Order" DESC',
             simple_search_field="ProductName",
+            key_columns=["Order"],
             db_path=db_path
         )
         
@@ -265,7 +270,7 @@ if __name__ == "__main__":
         )
 
         # -------- Widgets -----------
-        low_supply_header_value = len(reorder_ri.curr_results)
+        low_supply_header_value = reorder_ri.total_count
         
         # Top header frame
         top_header_frame = tk.Frame(inner_frame)
@@ -316,22 +321,18 @@ if __name__ == "__main__":
             font=("Segoe UI", 14, "bold")
         )
         
-        reorder_ri.on_search_clicked_original = reorder_ri.on_search_clicked
+        # Searches run on a worker thread, so the headers follow the results
+        # from after_search_clicked, which runs on the Tk thread once they land.
         def on_low_supply_tables_update():
-            out = reorder_ri.on_search_clicked_original() 
             if reorder_ri.is_filter_equal(reorder_ri.default_filters):
-                reorder_header.configure(text=f"Low ({str(len(reorder_ri.curr_results))})")
-            return out 
-        reorder_ri.on_search_clicked = on_low_supply_tables_update
+                reorder_header.configure(text=f"Low ({str(reorder_ri.total_count)})")
+        reorder_ri.after_search_clicked = on_low_supply_tables_update
     
 
-        dangerouslyLowRI.on_search_clicked_original = dangerouslyLowRI.on_search_clicked
         def on_danger_low_tables_update():
-            out = dangerouslyLowRI.on_search_clicked_original() 
             if dangerouslyLowRI.is_filter_equal(dangerouslyLowRI.default_filters):
-                dangerously_low_header.configure(text=f"Dangerously Low ({str(len(dangerouslyLowRI.curr_results))})")
-            return out 
-        dangerouslyLowRI.on_search_clicked = on_danger_low_tables_update
+                dangerously_low_header.configure(text=f"Dangerously Low ({str(dangerouslyLowRI.total_count)})")
+        dangerouslyLowRI.after_search_clicked = on_danger_low_tables_update
         
         dangerously_low_header.grid(row=0, column=0, columnspan=2, sticky="w", padx=10, pady=(10, 0))
         dangerouslyLow.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10, pady=(5,20))
@@ -420,5 +421,9 @@ if __name__ == "__main__":
     registry.on_table_update(show_warning_if_app_outdated) 
     show_warning_if_app_outdated()
 
+    if args.watch_interval > 0:
+        watcher.Watcher(root, db_path, interval_ms=args.watch_interval).start()
+
     root.mainloop()
+    print("Query cache:", query_cache.stats())
 
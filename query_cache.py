@@ -0,0 +1,85 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Results of recent searches, so re-running an identical query (switching
+# tabs, Reset, registry.refresh_all) doesn't go back to the database.
+#
+# Entries are keyed on the database's change counter (DB.change_counter), so
+# any committed write, from this process or another, makes every older entry
+# unreachable; they then age out of the LRU.
+QUERY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_entries = OrderedDict()  # key -> (rows, size in bytes), least recently used first
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_total_bytes = 0
+
+def estimate_size(rows):
+    """Rough memory footprint of a list of row dicts (or a scalar)."""
+    if not isinstance(rows, list):
+        return sys.getsizeof(rows)
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    # Column names are shared between the rows
+    if rows:
+        size += sum(sys.getsizeof(col) for col in rows[0].keys())
+    return size
+
+def copy_rows(value):
+    """
+    A copy of a list of row dicts, down to the rows: callers edit and splice
+    the rows they get back (splice_result, apply_change), and that mustn't
+    reach the cached entry.
+    """
+    return [dict(row) for row in value] if isinstance(value, list) else value
+
+def get(key):
+    """Returns (True, value) on a hit, (False, None) on a miss. Rows are copied so callers can modify them."""
+    with _cache_lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return (False, None)
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+    value = entry[0]
+    return (True, copy_rows(value))
+
+def put(key, value):
+    global _total_bytes
+    size = estimate_size(value)
+    if size > QUERY_CACHE_MAX_BYTES:
+        return
+    value = copy_rows(value)
+    with _cache_lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _total_bytes -= old[1]
+        _entries[key] = (value, size)
+        _total_bytes += size
+        while _total_bytes > QUERY_CACHE_MAX_BYTES:
+            _, (_, evicted_size) = _entries.popitem(last=False)
+            _total_bytes -= evicted_size
+            _stats["evictions"] += 1
+
+def clear():
+    global _total_bytes
+    with _cache_lock:
+        _entries.clear()
+        _total_bytes = 0
+
+def stats():
+    """Hit/miss counts and current size, for tuning QUERY_CACHE_MAX_BYTES."""
+    with _cache_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(_entries),
+            "bytes": _total_bytes,
+            "max_bytes": QUERY_CACHE_MAX_BYTES,
+        }
@@ -1,7 +1,15 @@
 import types
+import DB
+from background import run_in_background
 
 relation_widgets = dict()
 refresh_callbacks = dict()
+# Base table -> widgets whose relation reads it, from DB.get_base_tables
+dependents = dict()
+# Last seen DB.get_table_changes(), shared by local writes and the watcher
+table_changes = None
+# id(widget) -> the change counts of its base tables when refresh() last reloaded it
+refreshed_at = dict()
 
 def register(widget, parents):
     for parent in parents:
@@ -9,6 +17,41 @@ def register(widget, parents):
             relation_widgets[parent] = [widget]
         else:
             relation_widgets[parent].append(widget)
+    relation = widget.relation
+    for table in DB.get_base_tables(relation.relation_name, relation.db_path):
+        if table not in dependents:
+            dependents[table] = [widget]
+        else:
+            dependents[table].append(widget)
+
+def note_table_changes(counts):
+    """
+    Records the latest TableChanges counts and returns the tables that
+    changed since the last call. The first call only sets the baseline.
+    Counts only grow, so a late, older snapshot changes nothing. If they
+    went down, the database was rebuilt and every table counts as changed.
+    """
+    global table_changes
+    if table_changes is None:
+        table_changes = dict(counts)
+        return set()
+    if any(count < table_changes.get(table, 0) for table, count in counts.items()):
+        table_changes = dict(counts)
+        return set(counts)
+    changed = {table for table, count in counts.items() if count > table_changes.get(table, -1)}
+    table_changes.update({table: counts[table] for table in changed})
+    return changed
+
+def _base_table_counts(relation_widget, counts):
+    relation = relation_widget.relation
+    return {table: counts.get(table) for table in DB.get_base_tables(relation.relation_name, relation.db_path)}
+
+def _shows_defaults(relation_widget):
+    """True if refresh() would leave the widget's search text and filters as they are."""
+    relation = relation_widget.relation
+    return (relation_widget.search_entry.get() == relation.default_search_text
+            and relation.search_field_text == relation.default_search_text
+            and relation.is_filter_default())
 
 def _hash(parents):
     return str(sorted(parents))
@@ -17,16 +60,41 @@ def on_refresh(parents, func):
     refresh_callbacks[_hash(parents)] = func
 
 def refresh(parents):
-    finished = set()
-    for parent in parents:
-        for relation_widget in relation_widgets[parent]:
-            if relation_widget.relation.relation_name in finished:
+    """
+    Resets the widgets under parents to their default search and reloads
+    them. Widgets already showing the defaults, whose base tables haven't
+    changed since they were last reloaded, are left alone.
+    The change counts are read on a worker thread, so the reloads start
+    once they arrive.
+    """
+    widgets = [relation_widget for parent in parents for relation_widget in relation_widgets[parent]]
+    if not widgets:
+        return
+
+    def refresh_widgets(counts):
+        # Also sets the baseline later writes and watcher polls are compared with
+        changed = note_table_changes(counts) if counts is not None else set()
+        finished = set()
+        for relation_widget in widgets:
+            if relation_widget.relation.relation_name in finished or not relation_widget.winfo_exists():
                 continue
-            relation_widget.refresh()
             finished.add(relation_widget.relation.relation_name)
+            seen = _base_table_counts(relation_widget, counts) if counts is not None else None
+            if seen is not None and refreshed_at.get(id(relation_widget)) == seen and _shows_defaults(relation_widget):
+                continue
+            relation_widget.refresh()
+            refreshed_at[id(relation_widget)] = seen
             parent_set_hash = _hash(parents)
             if parent_set_hash in refresh_callbacks:
                 refresh_callbacks[parent_set_hash]()
+        # Changes picked up here are no longer news to the watcher
+        refresh_dependents(changed, exceptions=widgets)
+
+    def refresh_without_counts(error):
+        print("Could not read table changes, refreshing everything:", error)
+        refresh_widgets(None)
+
+    run_in_background(widgets[0], DB.get_table_changes, refresh_widgets, refresh_without_counts, widgets[0].relation.db_path)
 
 def refresh_all(exceptions=[]):
     parents = {parent for parent in relation_widgets.keys() if parent not in exceptions}
@@ -65,3 +133,53 @@ def on_table_update(callback, exceptions=[]):
                 obj.update_table_original()
                 callback()
             relation_widget.update_table = types.MethodType(callback_after_table_update, relation_widget)
+            # Writes patch the table through apply_change instead of update_table
+            relation_widget.apply_change_original = relation_widget.apply_change
+            def callback_after_change(obj, change):
+                obj.apply_change_original(change)
+                if change is not None and obj.relation.key_columns:
+                    callback()
+            relation_widget.apply_change = types.MethodType(callback_after_change, relation_widget)
+
+def widgets_reading(tables):
+    """Every registered widget whose relation reads one of tables."""
+    finished = set()
+    widgets = []
+    for table in sorted(tables):
+        for relation_widget in dependents.get(table, []):
+            if id(relation_widget) in finished:
+                continue
+            finished.add(id(relation_widget))
+            widgets.append(relation_widget)
+    return widgets
+
+def refresh_dependents(tables, exceptions=[]):
+    """
+    Re-runs the current search of every widget reading one of tables,
+    other than the widgets in exceptions.
+    Unlike refresh(), the user's search text and filters are kept.
+    """
+    for relation_widget in widgets_reading(tables):
+        if relation_widget in exceptions or not relation_widget.winfo_exists():
+            continue
+        relation_widget.run_search()
+        if table_changes is not None and _shows_defaults(relation_widget):
+            refreshed_at[id(relation_widget)] = _base_table_counts(relation_widget, table_changes)
+
+def on_write(relation_widget):
+    """
+    Called after relation_widget wrote to the database. The writer has
+    already patched its own rows; every other widget reading a table the
+    write touched (triggers and cascades included) is re-searched.
+    The change counts are read on a worker thread.
+    """
+    def refresh_affected(counts):
+        # Without a baseline there's no telling what the write touched
+        no_baseline = table_changes is None
+        changed = note_table_changes(counts)
+        refresh_dependents(set(counts) if no_baseline else changed, exceptions=[relation_widget])
+
+    def failed(error):
+        print("Could not read table changes after a write:", error)
+
+    run_in_background(relation_widget, DB.get_table_changes, refresh_affected, failed, relation_widget.relation.db_path)
@@ -0,0 +1,87 @@
+import os
+import DB
+import registry
+import lookup_cache
+from background import run_in_background
+
+# Picks up writes made by other lab PCs to the shared database and refreshes
+# only the widgets that read the tables they touched.
+#
+# Each poll is a stat() of the database file. Only when its mtime or size
+# moved is the header's change counter read (DB.change_counter), and only
+# when that moved is TableChanges queried. An idle poll never opens the file.
+WATCH_INTERVAL_MS = 3000
+
+# mtime can be too coarse to tell two quick commits apart, so the change
+# counter is also read every this many polls even if stat() looks the same.
+FORCE_CHECK_EVERY = 20
+
+class Watcher:
+    def __init__(self, widget, db_path, interval_ms=WATCH_INTERVAL_MS, on_change=None):
+        """
+        widget: any Tk widget, used to schedule the polls.
+        on_change(tables): called on the Tk thread with the set of changed
+        tables. Defaults to refresh_stale.
+        """
+        self.widget = widget
+        self.db_path = db_path
+        self.interval_ms = interval_ms
+        self.on_change = on_change or self.refresh_stale
+        self.file_stat = None
+        self.change_counter = None
+        self.polls = 0
+        self.checking = False
+        self.job = None
+
+    def start(self):
+        if self.job is None:
+            self.job = self.widget.after(self.interval_ms, self.poll)
+
+    def stop(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def poll(self):
+        self.job = self.widget.after(self.interval_ms, self.poll)
+        if self.checking:
+            return
+        self.polls += 1
+        force = self.polls % FORCE_CHECK_EVERY == 0
+        self.checking = True
+        run_in_background(self.widget, self.check, self.on_checked, self.on_failed, self.file_stat, self.change_counter, force)
+
+    def check(self, file_stat, change_counter, force):
+        """Runs on a worker thread. Returns None if nothing changed since the last check."""
+        st = os.stat(self.db_path)
+        new_stat = (st.st_mtime_ns, st.st_size)
+        if new_stat == file_stat and not force:
+            return None
+        new_counter = DB.change_counter(self.db_path)
+        if new_counter == change_counter and change_counter is not None:
+            return {"file_stat": new_stat, "change_counter": new_counter, "table_changes": None}
+        return {"file_stat": new_stat, "change_counter": new_counter, "table_changes": DB.get_table_changes(self.db_path)}
+
+    def on_checked(self, result):
+        self.checking = False
+        if result is None:
+            return
+        self.file_stat = result["file_stat"]
+        self.change_counter = result["change_counter"]
+        if result["table_changes"] is None:
+            return
+        # Shared with local writes, which already refreshed what they touched
+        changed = registry.note_table_changes(result["table_changes"])
+        if changed:
+            self.on_change(changed)
+
+    def on_failed(self, error):
+        # The share may be briefly unreachable; try again on the next poll
+        self.checking = False
+        print("Change check failed:", error)
+
+    def refresh_stale(self, tables):
+        print(f"Tables changed: {', '.join(sorted(tables))}")
+        if tables & lookup_cache.SOURCE_TABLES:
+            lookup_cache.invalidate(self.db_path)
+        registry.refresh_dependents(tables)